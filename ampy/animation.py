@@ -12,7 +12,7 @@ from celluloid import Camera
 from matplotlib import pyplot as plt
 import matplotlib.gridspec as gridspec
 
-from .processing import ARUCO_DICT
+from .processing import ARUCO_DICT, FramePreprocessor
 
 # the following parameters are for ArUco recognition & processing
 
@@ -123,22 +123,25 @@ def create_dashboard(video: list,
     animation.save(output_name)
 
 def draw_markers(frames: list,
-                 marker_type: str = "DICT_7X7_1000"
+                 marker_type: str = "DICT_7X7_1000",
+                 scale_parameters: tuple = (1, 0),
                  ) -> list:
     """
         Returns the list with the frames and highlighted markers.
 
         :param frames: list of the frames from the 'get_video' method output
         :param marker_type: robots' marker type
+        :param scale_parameters: pixels absolute scaling parameters used for the detection
     """
     frames_altered = deepcopy(frames)
+    arucoDict = cv2.aruco.Dictionary_get(ARUCO_DICT[marker_type])
+    arucoParams = cv2.aruco.DetectorParameters_create()
+    preprocessor = FramePreprocessor(scale_parameters)
     for j in tqdm(range(len(frames_altered))):
         image = frames_altered[j]
-        arucoDict = cv2.aruco.Dictionary_get(ARUCO_DICT[marker_type])
-        arucoParams = cv2.aruco.DetectorParameters_create()
 
         (corners, ids, rejected) = cv2.aruco.detectMarkers(
-            image, arucoDict, parameters=arucoParams
+            preprocessor(image), arucoDict, parameters=arucoParams
         )
 
         rvecs, tvecs, trash = aruco.estimatePoseSingleMarkers(
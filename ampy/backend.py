@@ -0,0 +1,289 @@
+"""
+Module provides execution backend of the statistics functions: the per-frame work is mapped
+serially, by a pool of threads or by a pool of processes. Pools are created once and reused
+by the following calls of importable functions, functions defined in *__main__* get a new
+process pool seeing their current definitions. Arrays are passed to the processes through
+shared memory
+"""
+import atexit
+import functools
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.pool import ThreadPool
+import os
+
+import numpy as np
+
+
+MODES = ("serial", "thread", "process", "auto")
+# estimated work (number of bots pairs processed by Python code) below which the process pool
+# start and the data transfer cost more than they save
+AUTO_SERIAL_WORK = 10**5
+# seconds between the checks of the process pool workers while waiting for the results
+WORKERS_CHECK_INTERVAL = 0.1
+
+_pools = {}
+
+
+class Backend:
+    """
+    *backend.Backend* class maps functions over items in the chosen execution mode: *serial*
+    in the calling process, *thread* or *process* pool, or *auto* choosing serial execution
+    for small work and the process pool otherwise
+    """
+    def __init__(self, mode: str = "auto", n_jobs: int = -1, chunksize: int = None):
+        """
+        :param mode: *serial*, *thread*, *process* or *auto*
+        :param n_jobs: number of workers of the pool (-1 to use all CPU cores)
+        :param chunksize: number of items sent to a worker at once, by default the items are
+            split into four chunks per worker
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown execution mode '{mode}', use one of {MODES}")
+        self.mode = mode
+        self.n_jobs = os.cpu_count() if n_jobs < 0 else max(n_jobs, 1)
+        self.chunksize = chunksize
+
+    def __repr__(self) -> str:
+        return f"Backend(mode={self.mode!r}, n_jobs={self.n_jobs}, chunksize={self.chunksize})"
+
+    def resolve_mode(self, items_number: int, cost: float = 1) -> str:
+        """
+        Returns the mode used for the given work: *auto* turns into *serial* for a single
+        worker or small work and into *process* otherwise
+
+        :param items_number: number of items to process
+        :param cost: estimated work of an item, in processed bots pairs
+        :return: execution mode
+        """
+        if self.mode != "auto":
+            return self.mode
+        if self.n_jobs == 1 or items_number < 2 or items_number * cost < AUTO_SERIAL_WORK:
+            return "serial"
+        return "process"
+
+    def map(self, function, items: list, cost: float = 1) -> list:
+        """
+        Returns results of the function for each item in the items order
+
+        :param function: function of one item, lambdas and nested functions are run serially
+            instead of the process mode
+        :param items: items to process
+        :param cost: estimated work of an item, in processed bots pairs, for the auto mode
+        :return: list of results
+        """
+        items = list(items)
+        mode = self._mode(function, items, cost)
+        if mode == "serial" or not items:
+            return [function(item) for item in items]
+        chunksize = self.chunksize or max(-(-len(items) // (4 * self.n_jobs)), 1)
+        return _execute(mode, self.n_jobs, function, items, chunksize)
+
+    def _mode(self, function, items: list, cost: float) -> str:
+        """
+        Returns the mode of the work, the process mode turns into serial for lambdas and
+        nested functions the workers cannot import
+        """
+        mode = self.resolve_mode(len(items), cost)
+        if mode == "process" and _origin((function, items)) == "local":
+            return "serial"
+        return mode
+
+    def ranges(self, items_number: int) -> list:
+        """
+        Returns (start, stop) ranges splitting the items into chunks of *chunksize* items or
+        into four chunks per worker
+
+        :param items_number: number of items
+        :return: list of ranges
+        """
+        size = self.chunksize or max(-(-items_number // (4 * self.n_jobs)), 1)
+        return [(start, min(start + size, items_number)) for start in range(0, items_number, size)]
+
+    def map_shared(self,
+                   function,
+                   arrays: dict,
+                   tasks: list,
+                   output_shape: tuple,
+                   cost: float = 1) -> np.ndarray:
+        """
+        Returns output array filled by the function called for each task as
+        *function(arrays, output, task)*. In the process mode the arrays and the output are
+        placed in shared memory once, so workers receive only the tasks and nothing is
+        pickled back
+
+        :param function: function writing the results of a task to the output, lambdas and
+            nested functions are run serially instead of the process mode
+        :param arrays: dictionary of input arrays
+        :param tasks: small picklable task descriptions, e.g. frame ranges
+        :param output_shape: shape of the float output array
+        :param cost: estimated work of a task, in processed bots pairs, for the auto mode
+        :return: output array
+        """
+        tasks = list(tasks)
+        output = np.zeros(output_shape)
+        mode = self._mode(function, tasks, cost)
+        if mode == "serial" or not tasks:
+            for task in tasks:
+                function(arrays, output, task)
+            return output
+        if mode == "thread":
+            _pool(mode, self.n_jobs).map(lambda task: function(arrays, output, task), tasks, 1)
+            return output
+
+        blocks = []
+        try:
+            specs = {}
+            for key, array in list(arrays.items()) + [("output", output)]:
+                array = np.ascontiguousarray(array)
+                blocks.append(shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1)))
+                np.ndarray(array.shape, array.dtype, buffer=blocks[-1].buf)[...] = array
+                specs[key] = (blocks[-1].name, array.shape, array.dtype.str)
+            _execute(mode, self.n_jobs, _shared_task,
+                     [(function, specs, task) for task in tasks], 1)
+            output[...] = np.ndarray(output.shape, output.dtype, buffer=blocks[-1].buf)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return output
+
+
+def _shared_task(packed_task: tuple) -> None: # pragma: no cover
+    function, specs, task = packed_task
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in specs.values()]
+    try:
+        arrays = {key: np.ndarray(shape, dtype, buffer=block.buf)
+                  for (key, (_, shape, dtype)), block in zip(specs.items(), blocks)}
+        output = arrays.pop("output")
+        function(arrays, output, task)
+        del arrays, output
+    finally:
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                # the views are kept by the traceback of the error, it is closed when collected
+                pass
+
+
+def _origin(obj) -> str:
+    """
+    Returns *local* if the object is or holds a lambda or a nested function, *main* if it holds
+    a function, a class or an instance of a class defined in *__main__*, and *module* otherwise
+    """
+    if isinstance(obj, functools.partial):
+        return _origin((obj.func, obj.args, obj.keywords))
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        objects = obj
+    elif isinstance(obj, dict):
+        objects = obj.values()
+    elif hasattr(obj, "__self__") and hasattr(obj, "__func__"):
+        objects = (obj.__self__, obj.__func__)
+    elif hasattr(obj, "__qualname__") and hasattr(obj, "__module__"):
+        if "<" in obj.__qualname__:
+            return "local"
+        return "main" if obj.__module__ == "__main__" else "module"
+    else:
+        return _origin(type(obj)) if type(obj).__module__ == "__main__" else "module"
+    origins = {_origin(item) for item in objects}
+    return next((origin for origin in ("local", "main") if origin in origins), "module")
+
+
+def _pool(mode: str, n_jobs: int):
+    """
+    Returns the persistent pool of the mode and size, creating it on the first use
+    """
+    key = (mode, n_jobs, os.getpid())
+    if key not in _pools and mode == "thread":
+        _pools[key] = ThreadPool(n_jobs)
+    elif key not in _pools:
+        _pools[key] = _process_pool(n_jobs)
+    return _pools[key]
+
+
+def _process_pool(n_jobs: int):
+    """
+    Returns new pool of processes
+    """
+    # workers must share the tracker of the shared memory blocks with this process,
+    # otherwise each one starts its own and unlinks the blocks it attached on exit
+    resource_tracker.ensure_running()
+    return mp.Pool(n_jobs)
+
+
+def _execute(mode: str, n_jobs: int, function, items: list, chunksize: int) -> list:
+    """
+    Returns results of the function mapped by the pool of the mode. Persistent process pools
+    are forked once and do not see the functions defined or redefined in *__main__* later,
+    such work is mapped by a new pool
+    """
+    if mode == "thread":
+        return _pool(mode, n_jobs).map(function, items, chunksize)
+    if _origin((function, items)) == "main":
+        with _process_pool(n_jobs) as pool:
+            return _wait(pool, function, items, chunksize)
+    key = (mode, n_jobs, os.getpid())
+    try:
+        return _wait(_pool(mode, n_jobs), function, items, chunksize)
+    except ChildProcessError:
+        _pools.pop(key).terminate()
+        raise
+
+
+def _wait(pool, function, items: list, chunksize: int) -> list:
+    """
+    Returns results of the function mapped by the process pool, raising *ChildProcessError*
+    if a worker dies, e.g. failing to unpickle its task, instead of waiting for the lost
+    results forever
+    """
+    workers = [worker for worker in pool._pool if worker.exitcode is None]
+    result = pool.map_async(function, items, chunksize)
+    while True:
+        try:
+            return result.get(WORKERS_CHECK_INTERVAL)
+        except mp.TimeoutError:
+            if any(worker.exitcode is not None for worker in workers):
+                raise ChildProcessError("Worker process of the pool died, its function or task "
+                                        "may be not importable in the workers") from None
+
+
+_default_backend = Backend()
+
+
+def get_backend(backend: Backend = None) -> Backend:
+    """
+    Returns the given backend or the default one if None
+
+    :param backend: execution backend
+    :return: execution backend
+    """
+    return _default_backend if backend is None else backend
+
+
+def set_backend(mode: str = "auto", n_jobs: int = -1, chunksize: int = None) -> Backend:
+    """
+    Sets the default execution backend of the statistics functions
+
+    :param mode: *serial*, *thread*, *process* or *auto*
+    :param n_jobs: number of workers of the pool (-1 to use all CPU cores)
+    :param chunksize: number of items sent to a worker at once
+    :return: new default backend
+    """
+    global _default_backend
+    _default_backend = Backend(mode, n_jobs, chunksize)
+    return _default_backend
+
+
+def shutdown() -> None:
+    """
+    Terminates the persistent pools, they are created again when needed
+    """
+    for key in list(_pools):
+        pool = _pools.pop(key)
+        if key[2] == os.getpid():
+            pool.terminate()
+            pool.join()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,155 @@
+"""
+Module provides batch processing of many experiment videos with a pool of processes
+"""
+import multiprocessing as mp
+import os
+import pickle
+import time
+
+import cv2
+
+from .processing import Processor
+from .utils import frame_range
+
+
+JOB_DEFAULTS = {
+    "begin_frame": 0,
+    "end_frame": 10**9,
+    "get_each": 1,
+    "ignore_codes": (),
+    "scale_parameters": (1, 0),
+    "dictionary": "DICT_7X7_1000",
+}
+
+
+def _frames_number(job: dict) -> int:
+    """
+    Returns number of frames to process in the job, 0 if the video can not be opened
+    """
+    video_capture = cv2.VideoCapture(job["filename"])
+    try:
+        if not video_capture.isOpened():
+            return 0
+        start_frame, finish_frame = frame_range(video_capture, job["begin_frame"],
+                                                job["end_frame"])
+        return len(range(start_frame, finish_frame + 1, job["get_each"]))
+    finally:
+        video_capture.release()
+
+
+def _process_job(job: dict) -> dict: # pragma: no cover
+    """
+    Processes a single video, saves its kinematics and returns the summary row
+    """
+    if job["single_thread"]:
+        cv2.setNumThreads(1)
+    row = {"filename": job["filename"], "output": job["output"], "frames": job["frames"],
+           "seconds": 0.0, "fps": 0.0, "status": "ok", "error": None}
+    start_time = time.perf_counter()
+    try:
+        if not os.path.isfile(job["filename"]):
+            raise FileNotFoundError(f"No such video file: {job['filename']}")
+        processor = Processor()
+        processor.set_filename(job["filename"])
+        processor.set_aruco_dict(job["dictionary"])
+        kinematics = processor.cartesian_kinematics(job["bots_number"],
+                                                    job["begin_frame"],
+                                                    job["end_frame"],
+                                                    job["get_each"],
+                                                    tuple(job["ignore_codes"]),
+                                                    tuple(job["scale_parameters"]),
+                                                    **job["options"])
+        temporary_path = job["output"] + ".tmp"
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(kinematics, file)
+        os.replace(temporary_path, job["output"])
+    except Exception as error: # pylint: disable=broad-except
+        row["status"] = "failed"
+        row["error"] = f"{type(error).__name__}: {error}"
+        row["output"] = None
+    row["seconds"] = time.perf_counter() - start_time
+    if row["status"] == "ok" and row["seconds"] > 0:
+        row["fps"] = row["frames"] / row["seconds"]
+    return row
+
+
+def _indexed_process_job(indexed_job: tuple) -> tuple: # pragma: no cover
+    i_job, job = indexed_job
+    return i_job, _process_job(job)
+
+
+def process_many(jobs: list, output_directory: str, n_jobs: int = -1) -> list:
+    """
+    Extracts cartesian kinematics from many videos. The videos are processed by a pool of
+    processes, the longest ones (by number of frames to process) are started first. Kinematics
+    of each video is saved to the output directory by *pickle* as soon as it is ready and can
+    be loaded by *Processor.load_p*. A failed video does not stop the others
+
+    :param jobs: list of dictionaries with *filename* and *bots_number* keys and optionally
+        *begin_frame*, *end_frame*, *get_each*, *ignore_codes*, *scale_parameters*,
+        *dictionary* (ArUco dictionary name), *output* (file name in the output directory)
+        and any other *Processor.cartesian_kinematics* parameters. Pool workers can not start
+        processes of their own, so *n_jobs* of the jobs is replaced by 1 when the videos are
+        processed by several workers
+    :param output_directory: directory to save the kinematics to
+    :param n_jobs: number of worker processes (-1 to use all CPU cores)
+    :return: summary table, a row for each job in the given order with *filename*, *output*,
+        *frames*, *seconds*, *fps*, *status* (*ok* or *failed*) and *error* values
+    """
+
+    os.makedirs(output_directory, exist_ok=True)
+    prepared_jobs = []
+    outputs = set()
+    for job in jobs:
+        prepared_job = dict(JOB_DEFAULTS)
+        prepared_job.update(job)
+        if "filename" not in prepared_job or "bots_number" not in prepared_job:
+            raise ValueError("Each job must have 'filename' and 'bots_number' values")
+        output = prepared_job.get("output") or \
+            os.path.splitext(os.path.basename(prepared_job["filename"]))[0] + ".pickle"
+        if output in outputs:
+            raise ValueError(f"Several jobs are saved to the same file '{output}', "
+                             f"set 'output' for them")
+        outputs.add(output)
+        prepared_job["output"] = os.path.join(output_directory, output)
+        prepared_job["options"] = {key: value for key, value in prepared_job.items()
+                                   if key not in JOB_DEFAULTS
+                                   and key not in ("filename", "bots_number", "output")}
+        prepared_job["frames"] = _frames_number(prepared_job)
+        prepared_jobs.append(prepared_job)
+
+    if n_jobs < 0:
+        n_jobs = os.cpu_count()
+    n_jobs = max(min(n_jobs, len(prepared_jobs)), 1)
+    order = sorted(range(len(prepared_jobs)), key=lambda i_job: -prepared_jobs[i_job]["frames"])
+    for prepared_job in prepared_jobs:
+        prepared_job["single_thread"] = n_jobs > 1
+        if n_jobs > 1 and "n_jobs" in prepared_job["options"]:
+            prepared_job["options"]["n_jobs"] = 1
+
+    rows = [None] * len(prepared_jobs)
+    if n_jobs == 1:
+        for i_job in order:
+            rows[i_job] = _process_job(prepared_jobs[i_job])
+    else:
+        with mp.Pool(n_jobs) as pool:
+            results = pool.imap_unordered(_indexed_process_job,
+                                          [(i_job, prepared_jobs[i_job]) for i_job in order])
+            for i_job, row in results:
+                rows[i_job] = row
+    return rows
+
+
+def format_summary(rows: list) -> str:
+    """
+    Returns the *process_many* summary table as text
+
+    :param rows: summary rows
+    :return: table with a line for each job
+    """
+    lines = [f"{'file':<40} {'frames':>7} {'seconds':>8} {'fps':>7}  status"]
+    for row in rows:
+        status = row["status"] if row["error"] is None else f"{row['status']} ({row['error']})"
+        lines.append(f"{os.path.basename(row['filename']):<40} {row['frames']:>7} "
+                     f"{row['seconds']:>8.1f} {row['fps']:>7.1f}  {status}")
+    return "\n".join(lines)
@@ -0,0 +1,162 @@
+"""
+Module provides persistent on-disk storage of raw markers detections, so repeated
+processing of the same video does not repeat the detection
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import uuid
+
+import numpy as np
+
+
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_SAMPLE_SIZE = 1 << 16
+
+
+def video_fingerprint(filename: str) -> str:
+    """
+    Returns hash of a video file computed from its size and evenly spaced samples
+    of its content, so it stays cheap for long recordings
+
+    :param filename: the path
+    :return: hex digest
+    """
+    size = os.path.getsize(filename)
+    digest = hashlib.sha1(str(size).encode())
+    with open(filename, 'rb') as file:
+        for i_sample in range(FINGERPRINT_SAMPLES):
+            file.seek(max(size - FINGERPRINT_SAMPLE_SIZE, 0) * i_sample
+                      // (FINGERPRINT_SAMPLES - 1))
+            digest.update(file.read(FINGERPRINT_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """
+    *cache.DetectionCache* class keeps raw per-frame detections (markers ids and corners)
+    in a directory. Detections of each video and detector settings are stored in their own
+    subdirectory as independent append-only chunks, the least recently used subdirectories
+    are removed when the total size exceeds the limit (None for no limit)
+    """
+    def __init__(self, directory: str, max_size: int = 1 << 30):
+        self._directory = directory
+        self._max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, filename: str, settings: dict) -> str:
+        """
+        Returns cache key of a video processed with given settings
+
+        :param filename: the path
+        :param settings: JSON-serializable detector settings
+        :return: cache key
+        """
+        description = json.dumps({"video": video_fingerprint(filename), "settings": settings},
+                                 sort_keys=True)
+        return hashlib.sha1(description.encode()).hexdigest()
+
+    def load(self, key: str) -> dict:
+        """
+        Returns cached detections
+
+        :param key: cache key
+        :return: dictionary of frame number to (corners, ids) arrays
+        """
+        entry_directory = os.path.join(self._directory, key)
+        detections = {}
+        if not os.path.isdir(entry_directory):
+            return detections
+        for chunk_name in sorted(os.listdir(entry_directory)):
+            if not chunk_name.endswith('.pickle'):
+                continue
+            try:
+                with open(os.path.join(entry_directory, chunk_name), 'rb') as file:
+                    detections.update(pickle.load(file))
+            except (OSError, EOFError, pickle.UnpicklingError): # pragma: no cover
+                continue
+        os.utime(entry_directory)
+        return detections
+
+    def save(self, key: str, detections: dict) -> None:
+        """
+        Adds detections to the cache as a new chunk and evicts old entries if needed
+
+        :param key: cache key
+        :param detections: dictionary of frame number to (corners, ids) arrays
+        """
+        if not detections:
+            return
+        entry_directory = os.path.join(self._directory, key)
+        os.makedirs(entry_directory, exist_ok=True)
+        chunk_name = uuid.uuid4().hex
+        temporary_path = os.path.join(entry_directory, chunk_name + '.tmp')
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(detections, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, os.path.join(entry_directory, chunk_name + '.pickle'))
+        os.utime(entry_directory)
+        self._evict(keep=key)
+
+    def remove(self, key: str) -> None:
+        """
+        Removes cached detections of a single entry
+
+        :param key: cache key
+        """
+        shutil.rmtree(os.path.join(self._directory, key), ignore_errors=True)
+
+    def clear(self) -> None:
+        """
+        Removes all cached detections
+        """
+        for key in os.listdir(self._directory):
+            shutil.rmtree(os.path.join(self._directory, key), ignore_errors=True)
+
+    def _evict(self, keep: str) -> None:
+        if self._max_size is None:
+            return
+        entries = []
+        for key in os.listdir(self._directory):
+            entry_directory = os.path.join(self._directory, key)
+            if not os.path.isdir(entry_directory):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry_directory, name))
+                       for name in os.listdir(entry_directory))
+            entries.append((os.path.getmtime(entry_directory), key, size))
+        total_size = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self._directory, key), ignore_errors=True)
+            total_size -= size
+
+
+def pack_detections(corners: list, ids: np.ndarray) -> tuple:
+    """
+    Returns detections of a frame as compact arrays
+
+    :param corners: markers corners in the *cv2.aruco.detectMarkers* format
+    :param ids: markers ids in the *cv2.aruco.detectMarkers* format
+    :return: corners of (n, 4, 2) shape and ids of (n,) shape
+    """
+    if ids is None or len(corners) == 0:
+        return np.zeros((0, 4, 2), dtype=np.float32), np.zeros(0, dtype=np.int32)
+    return (np.concatenate(corners).reshape((-1, 4, 2)).astype(np.float32),
+            np.asarray(ids, dtype=np.int32).reshape(-1))
+
+
+def unpack_detections(detections: tuple) -> tuple:
+    """
+    Returns detections of a frame in the *cv2.aruco.detectMarkers* format
+
+    :param detections: corners of (n, 4, 2) shape and ids of (n,) shape
+    :return: markers corners and ids
+    """
+    corners, ids = detections
+    return list(corners[:, np.newaxis]), ids[:, np.newaxis]
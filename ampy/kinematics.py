@@ -0,0 +1,206 @@
+"""
+Module provides columnar storage of the system's kinematics shared by the processing
+and statistics modules
+"""
+
+import numpy as np
+
+
+class KinematicsArray:
+    """
+    *kinematics.KinematicsArray* class stores system's kinematics as typed arrays:
+    bots ids (N), orientation angles (F, N), positions (F, N, 2) and optionally polar angles
+    (F, N) and distances from the field center (F, N), where F is a number of frames
+    and N is a number of bots
+    """
+    def __init__(self,
+                 ids: np.ndarray,
+                 angles: np.ndarray,
+                 positions: np.ndarray,
+                 polar_angles: np.ndarray = None,
+                 distances: np.ndarray = None):
+        self.ids = np.asarray(ids)
+        self.angles = np.asarray(angles, dtype=float)
+        self.positions = np.asarray(positions, dtype=float)
+        self.polar_angles = None if polar_angles is None else np.asarray(polar_angles, dtype=float)
+        self.distances = None if distances is None else np.asarray(distances, dtype=float)
+
+        frames_number, bots_number = self.angles.shape
+        if self.ids.shape != (bots_number,):
+            raise ValueError("Ids must be a vector with a value for each bot")
+        if self.positions.shape != (frames_number, bots_number, 2):
+            raise ValueError("Positions must be an array of (frames, bots, 2) shape")
+        for column in (self.polar_angles, self.distances):
+            if column is not None and column.shape != (frames_number, bots_number):
+                raise ValueError("Polar columns must be arrays of (frames, bots) shape")
+
+    @classmethod
+    def from_list(cls, kinematics: list) -> "KinematicsArray":
+        """
+        Returns columnar kinematics built from the list of frame-by-frame kinematics
+
+        :param kinematics: list of [id, angle, (x, y)] or [id, angle, (x, y), polar angle,
+            distance] values for each bot in each frame
+        :return: columnar kinematics
+        """
+        if isinstance(kinematics, cls):
+            return kinematics
+        if len(kinematics) == 0:
+            raise ValueError("Kinematics must contain at least one frame")
+
+        ids = np.array([[bot[0] for bot in frame] for frame in kinematics])
+        if ids.ndim != 2 or (ids != ids[0]).any():
+            raise ValueError("Each frame must contain the same bots in the same order")
+        angles = [[bot[1] for bot in frame] for frame in kinematics]
+        positions = [[bot[2] for bot in frame] for frame in kinematics]
+        polar_angles, distances = None, None
+        if ids.shape[1] > 0 and all(len(bot) >= 5 for bot in kinematics[0]):
+            polar_angles = [[bot[3] for bot in frame] for frame in kinematics]
+            distances = [[bot[4] for bot in frame] for frame in kinematics]
+        return cls(ids[0], angles, np.reshape(positions, ids.shape + (2,)),
+                   polar_angles, distances)
+
+    def to_list(self) -> list:
+        """
+        Returns kinematics in the list format: [id, angle, (x, y)] values for each bot
+        in each frame extended by polar angle and distance if they are present
+
+        :return: list of frame-by-frame kinematics
+        """
+        ids = self.ids.tolist()
+        angles = self.angles.tolist()
+        positions = self.positions.tolist()
+        if not self.has_polar:
+            return [[[bot_id, angle, tuple(position)]
+                     for bot_id, angle, position in zip(ids, frame_angles, frame_positions)]
+                    for frame_angles, frame_positions in zip(angles, positions)]
+        polar_angles = self.polar_angles.tolist()
+        distances = self.distances.tolist()
+        return [[[bot_id, angle, tuple(position), polar_angle, distance]
+                 for bot_id, angle, position, polar_angle, distance
+                 in zip(ids, frame_angles, frame_positions, frame_polar_angles, frame_distances)]
+                for frame_angles, frame_positions, frame_polar_angles, frame_distances
+                in zip(angles, positions, polar_angles, distances)]
+
+    @property
+    def frames_number(self) -> int:
+        """
+        Number of frames
+        """
+        return self.angles.shape[0]
+
+    @property
+    def bots_number(self) -> int:
+        """
+        Number of bots
+        """
+        return self.angles.shape[1]
+
+    @property
+    def has_polar(self) -> bool:
+        """
+        Whether kinematics is extended by polar coordinates
+        """
+        return self.polar_angles is not None and self.distances is not None
+
+    def __len__(self) -> int:
+        return self.frames_number
+
+    def with_polar(self, polar_angles: np.ndarray, distances: np.ndarray) -> "KinematicsArray":
+        """
+        Returns kinematics extended by polar coordinates, other columns are shared
+
+        :param polar_angles: polar angles of (frames, bots) shape
+        :param distances: distances from the field center of (frames, bots) shape
+        :return: extended kinematics
+        """
+        return KinematicsArray(self.ids, self.angles, self.positions, polar_angles, distances)
+
+    def columns(self) -> dict:
+        """
+        Returns dictionary of the present arrays by the constructor parameters names, so
+        *KinematicsArray(**columns)* restores the kinematics
+
+        :return: dictionary of arrays
+        """
+        columns = {"ids": self.ids, "angles": self.angles, "positions": self.positions}
+        if self.has_polar:
+            columns.update(polar_angles=self.polar_angles, distances=self.distances)
+        return columns
+
+    def frames(self, start: int = None, stop: int = None, step: int = None) -> "KinematicsArray":
+        """
+        Returns kinematics of the frames range, arrays are views of the original ones
+
+        :param start: first frame index
+        :param stop: frame index to stop before
+        :param step: frames decimation frequency
+        :return: kinematics of the frames range
+        """
+        frames_slice = slice(start, stop, step)
+        return self._view(frames_slice, slice(None))
+
+    def frame(self, i_frame: int) -> "KinematicsArray":
+        """
+        Returns kinematics of a single frame, arrays are views of the original ones
+
+        :param i_frame: frame index
+        :return: kinematics of the frame
+        """
+        i_frame = range(self.frames_number)[i_frame]
+        return self._view(slice(i_frame, i_frame + 1), slice(None))
+
+    def bot(self, bot_id: int) -> "KinematicsArray":
+        """
+        Returns kinematics of a single bot, arrays are views of the original ones
+
+        :param bot_id: bot's marker id
+        :return: kinematics of the bot
+        """
+        i_bot = self.bot_index(bot_id)
+        return self._view(slice(None), slice(i_bot, i_bot + 1))
+
+    def bot_index(self, bot_id: int) -> int:
+        """
+        Returns column index of the bot
+
+        :param bot_id: bot's marker id
+        :return: column index
+        """
+        indices = np.flatnonzero(self.ids == bot_id)
+        if len(indices) == 0:
+            raise KeyError(f"There is no bot with id {bot_id}")
+        return int(indices[0])
+
+    def _view(self, frames_slice: slice, bots_slice: slice) -> "KinematicsArray":
+        polar_angles, distances = None, None
+        if self.has_polar:
+            polar_angles = self.polar_angles[frames_slice, bots_slice]
+            distances = self.distances[frames_slice, bots_slice]
+        return KinematicsArray(self.ids[bots_slice],
+                               self.angles[frames_slice, bots_slice],
+                               self.positions[frames_slice, bots_slice],
+                               polar_angles,
+                               distances)
+
+
+def as_kinematics_array(kinematics) -> KinematicsArray:
+    """
+    Returns kinematics in the columnar form, list kinematics are converted
+
+    :param kinematics: list of frame-by-frame kinematics or *KinematicsArray*
+    :return: columnar kinematics
+    """
+    return KinematicsArray.from_list(kinematics)
+
+
+def as_kinematics_list(kinematics) -> list:
+    """
+    Returns kinematics in the list form, columnar kinematics are converted
+
+    :param kinematics: list of frame-by-frame kinematics or *KinematicsArray*
+    :return: list of frame-by-frame kinematics
+    """
+    if isinstance(kinematics, KinematicsArray):
+        return kinematics.to_list()
+    return kinematics
@@ -0,0 +1,248 @@
+"""
+Module provides real-time processing of live video sources: cameras, streams or video files
+replayed at their native frame rate
+"""
+from collections import deque
+import threading
+import time
+
+import cv2
+
+from .cache import unpack_detections
+from .processing import Processor, _MarkerTracker
+
+
+class LiveProcessor:
+    """
+    *live.LiveProcessor* class detects markers in the frames of any *cv2.VideoCapture* source
+    as they arrive. The source is read by a separate thread which keeps only the latest frame,
+    so when the detection falls behind the frames are dropped instead of being queued.
+    Frames which waited longer than the latency budget are dropped as well. Raw cartesian
+    kinematics of the processed frames are kept in a ring buffer and passed to the callback
+    """
+    def __init__(self,
+                 processor: Processor,
+                 source,
+                 ignore_codes: tuple = (),
+                 scale_parameters: tuple = (1, 0),
+                 bots_number: int = 0,
+                 latency_budget: float = 0.1,
+                 buffer_size: int = 1000,
+                 callback=None,
+                 native_rate: bool = False,
+                 ):
+        """
+        :param processor: processor with the detector settings
+        :param source: device index, video path or stream URL, or opened *cv2.VideoCapture*
+        :param ignore_codes: markers to ignore while recognition
+        :param scale_parameters: pixels absolute scaling parameters
+        :param bots_number: number of bots expected in each frame (used by the tracking mode)
+        :param latency_budget: maximal time in seconds a frame may wait for the detection
+        :param buffer_size: number of the last processed frames to keep
+        :param callback: function called with frame number and raw cartesian kinematics
+            of each processed frame
+        :param native_rate: read the source not faster than its frame rate, which replays
+            a video file as if it was a live stream
+        """
+        self._processor = processor
+        self._source = source
+        self._ignore_codes = ignore_codes
+        self._scale_parameters = scale_parameters
+        self._bots_number = bots_number
+        self._latency_budget = latency_budget
+        self._callback = callback
+        self._native_rate = native_rate
+
+        self._buffer = deque(maxlen=buffer_size)
+        self._latencies = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._video_capture = None
+        self._threads = []
+        self._error = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pending = None
+        self._capture_finished = False
+        self._captured = 0
+        self._processed = 0
+        self._dropped = 0
+        self._max_frames = None
+        self._start_time = None
+        self._finish_time = None
+        self._buffer.clear()
+        self._latencies.clear()
+        self._stop_event.clear()
+        self._error = None
+
+    def start(self, max_frames: int = None) -> None:
+        """
+        Starts reading and processing of the source in background threads
+
+        :param max_frames: number of frames to process before stopping
+        """
+        if self._threads:
+            raise RuntimeError("Live processing is already running")
+        self._reset()
+        self._max_frames = max_frames
+        if isinstance(self._source, cv2.VideoCapture):
+            self._video_capture = self._source
+        else:
+            self._video_capture = cv2.VideoCapture(self._source)
+        if not self._video_capture.isOpened():
+            raise ValueError(f"Can not open video source {self._source!r}")
+
+        self._start_time = time.perf_counter()
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True),
+                         threading.Thread(target=self._processing_loop, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> dict:
+        """
+        Stops the processing and releases the source
+
+        :return: processing statistics, see *statistics*
+        """
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._finish_time is None:
+            self._finish_time = time.perf_counter()
+        if self._video_capture is not None and self._video_capture is not self._source:
+            self._video_capture.release()
+        self._video_capture = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        return self.statistics()
+
+    def run(self, duration: float = None, max_frames: int = None) -> dict:
+        """
+        Processes the source until it ends, the duration expires or the number of frames
+        is processed
+
+        :param duration: processing time limit in seconds
+        :param max_frames: number of frames to process
+        :return: processing statistics, see *statistics*
+        """
+        self.start(max_frames)
+        try:
+            processing_thread = self._threads[1]
+            while processing_thread.is_alive():
+                processing_thread.join(0.05)
+                if duration is not None and time.perf_counter() - self._start_time > duration:
+                    break
+        finally:
+            statistics = self.stop()
+        return statistics
+
+    def kinematics(self) -> list:
+        """
+        Returns raw cartesian kinematics of the last processed frames
+
+        :return: list of (frame number, raw cartesian kinematics) pairs
+        """
+        with self._condition:
+            return [(frame_number, kinematics) for frame_number, _, kinematics in self._buffer]
+
+    def statistics(self) -> dict:
+        """
+        Returns processing statistics: numbers of captured, processed and dropped frames,
+        achieved processing rate in frames per second and end-to-end latency (from reading
+        of a frame to its kinematics) in seconds over the last processed frames
+
+        :return: dictionary of statistics
+        """
+        with self._condition:
+            latencies = list(self._latencies)
+            finish_time = self._finish_time or time.perf_counter()
+            elapsed = finish_time - self._start_time if self._start_time is not None else 0.0
+            return {
+                "captured": self._captured,
+                "processed": self._processed,
+                "dropped": self._dropped,
+                "fps": self._processed / elapsed if elapsed > 0 else 0.0,
+                "latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+                "latency_max": max(latencies, default=0.0),
+                "latency_last": latencies[-1] if latencies else 0.0,
+            }
+
+    def __enter__(self) -> "LiveProcessor":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _capture_loop(self) -> None:
+        frame_period = 0.0
+        if self._native_rate:
+            frame_rate = self._video_capture.get(cv2.CAP_PROP_FPS)
+            frame_period = 1 / frame_rate if frame_rate > 0 else 0.0
+        frame_number = 0
+        try:
+            while not self._stop_event.is_set():
+                if frame_period:
+                    delay = self._start_time + frame_number * frame_period - time.perf_counter()
+                    if delay > 0 and self._stop_event.wait(delay):
+                        break
+                success, frame = self._video_capture.read()
+                if not success:
+                    break
+                frame_number += 1
+                with self._condition:
+                    if self._pending is not None:
+                        self._dropped += 1
+                    self._pending = (frame_number, time.perf_counter(), frame)
+                    self._captured += 1
+                    self._condition.notify_all()
+        finally:
+            with self._condition:
+                self._capture_finished = True
+                self._condition.notify_all()
+
+    def _processing_loop(self) -> None:
+        preprocessor = self._processor.frame_preprocessor(self._scale_parameters)
+        tracker = None
+        if self._processor._tracking is not None:
+            tracker = _MarkerTracker(self._processor, self._ignore_codes, self._bots_number,
+                                     *self._processor._tracking)
+        try:
+            while not self._stop_event.is_set():
+                with self._condition:
+                    while self._pending is None and not self._capture_finished\
+                            and not self._stop_event.is_set():
+                        self._condition.wait()
+                    if self._pending is None:
+                        break
+                    frame_number, timestamp, frame = self._pending
+                    self._pending = None
+                    if time.perf_counter() - timestamp > self._latency_budget:
+                        self._dropped += 1
+                        continue
+
+                corners, ids = unpack_detections(
+                    self._processor._detect_frame(frame, preprocessor, tracker))
+                kinematics = self._processor._kinematics_from_markers(corners, ids,
+                                                                      self._ignore_codes)
+                with self._condition:
+                    self._latencies.append(time.perf_counter() - timestamp)
+                    self._buffer.append((frame_number, timestamp, kinematics))
+                    self._processed += 1
+                    processed = self._processed
+                if self._callback is not None:
+                    self._callback(frame_number, kinematics)
+                if self._max_frames is not None and processed >= self._max_frames:
+                    break
+        except Exception as error: # pragma: no cover
+            self._error = error
+        finally:
+            self._finish_time = time.perf_counter()
+            self._stop_event.set()
+            with self._condition:
+                self._condition.notify_all()
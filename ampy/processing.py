@@ -2,18 +2,32 @@
 Module provides the processing of experimental video recordings and identifies ArUco markers
 placed on the robots' upper surfaces
 """
-from copy import deepcopy
+from collections import deque
+import functools
+from itertools import islice
 from tqdm import tqdm
+import json
+import multiprocessing as mp
+import os
 import pickle
+import queue
+import threading
+import time
 
 import numpy as np
 
 import cv2
 from matplotlib import pyplot as plt
 
+from .cache import DetectionCache, pack_detections, unpack_detections
+from .kinematics import KinematicsArray
+from .utils import frame_range, read_frames
+
 
 RAD2DEG = 180 / np.pi
 DEG2RAD = np.pi / 180
+# number of newly detected frames written to the detections cache as one chunk
+CACHE_CHUNK_FRAMES = 500
 
 ARUCO_DICT = {
     "DICT_4X4_50": cv2.aruco.DICT_4X4_50,
@@ -40,6 +54,33 @@ ARUCO_DICT = {
 }
 
 
+# options of the detector parameters tried by *Processor.autotune_detector*, one group
+# of alternatives after another, the first option of each group is the OpenCV default
+DETECTOR_SEARCH_SPACE = [
+    [{"adaptiveThreshWinSizeMin": 3, "adaptiveThreshWinSizeMax": 23,
+      "adaptiveThreshWinSizeStep": 10},
+     {"adaptiveThreshWinSizeMin": 3, "adaptiveThreshWinSizeMax": 13,
+      "adaptiveThreshWinSizeStep": 10},
+     {"adaptiveThreshWinSizeMin": 5, "adaptiveThreshWinSizeMax": 15,
+      "adaptiveThreshWinSizeStep": 10},
+     {"adaptiveThreshWinSizeMin": 7, "adaptiveThreshWinSizeMax": 7,
+      "adaptiveThreshWinSizeStep": 10},
+     {"adaptiveThreshWinSizeMin": 13, "adaptiveThreshWinSizeMax": 13,
+      "adaptiveThreshWinSizeStep": 10},
+     {"adaptiveThreshWinSizeMin": 23, "adaptiveThreshWinSizeMax": 23,
+      "adaptiveThreshWinSizeStep": 10}],
+    [{"minMarkerPerimeterRate": 0.03},
+     {"minMarkerPerimeterRate": 0.02},
+     {"minMarkerPerimeterRate": 0.05}],
+    [{"maxMarkerPerimeterRate": 4.0},
+     {"maxMarkerPerimeterRate": 1.0},
+     {"maxMarkerPerimeterRate": 0.5}],
+    [{"cornerRefinementMethod": cv2.aruco.CORNER_REFINE_NONE},
+     {"cornerRefinementMethod": cv2.aruco.CORNER_REFINE_SUBPIX},
+     {"cornerRefinementMethod": cv2.aruco.CORNER_REFINE_CONTOUR}],
+]
+
+
 def calc_angle(point_a: tuple, point_b: tuple) -> float: # pragma: no cover
     """
     Returns angle in degrees between OX-axis and (b-a) vector direction
@@ -63,6 +104,467 @@ def calc_distance(point_a: tuple, point_b: tuple) -> float: # pragma: no cover
     return ((point_a[0] - point_b[0])**2 + (point_a[1] - point_b[1])**2)**0.5
 
 
+def _raw_cartesian_kinematics_shard(shard: tuple) -> list: # pragma: no cover
+    (processor, frame_numbers, ignore_codes, scale_parameters,
+     decode_mode, n_threads, queue_size, bots_number, checkpoint) = shard
+    # shards already occupy all the cores, so OpenCV should not spawn its own threads
+    cv2.setNumThreads(1)
+    return processor._raw_cartesian_kinematics(frame_numbers, ignore_codes, scale_parameters,
+                                               decode_mode, n_threads, queue_size,
+                                               bots_number, checkpoint, progress=False)
+
+
+def _ordered_pipeline(items, function, n_threads: int, queue_size: int):
+    """
+    Yields (key, function(value)) for (key, value) items in the original order. A reader
+    thread pulls the items into a bounded queue, a pool of threads applies the function and
+    the results are reassembled in order. At most queue_size + n_threads items are in flight
+    """
+
+    tasks = queue.Queue(queue_size)
+    results = queue.Queue()
+    in_flight = threading.BoundedSemaphore(queue_size + n_threads)
+    stop = threading.Event()
+
+    def put_task(task) -> bool:
+        while not stop.is_set():
+            try:
+                tasks.put(task, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for index, (key, value) in enumerate(items):
+                while not in_flight.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if not put_task((index, key, value)):
+                    return
+        except Exception as error: # pylint: disable=broad-except
+            results.put((-1, None, None, error))
+        finally:
+            for _ in range(n_threads):
+                put_task(None)
+
+    def work():
+        while True:
+            try:
+                task = tasks.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if task is None:
+                results.put(None)
+                return
+            index, key, value = task
+            try:
+                results.put((index, key, function(value), None))
+            except Exception as error: # pylint: disable=broad-except
+                results.put((index, key, None, error))
+
+    threads = [threading.Thread(target=read, daemon=True)]
+    threads += [threading.Thread(target=work, daemon=True) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+
+    pending = {}
+    next_index = 0
+    finished_threads = 0
+    try:
+        while finished_threads < n_threads:
+            result = results.get()
+            if result is None:
+                finished_threads += 1
+                continue
+            index, key, value, error = result
+            if error is not None:
+                raise error
+            pending[index] = (key, value)
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+                in_flight.release()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def _detector_parameters_to_dict(parameters) -> dict:
+    """
+    Returns values of the ArUco detector parameters
+    """
+    values = {}
+    for name in dir(parameters):
+        value = getattr(parameters, name)
+        if not name.startswith('_') and isinstance(value, (bool, int, float)):
+            values[name] = value
+    return values
+
+
+def _detector_parameters_from_dict(values: dict):
+    """
+    Returns ArUco detector parameters with given values
+    """
+    parameters = cv2.aruco.DetectorParameters_create()
+    for name, value in values.items():
+        setattr(parameters, name, value)
+    return parameters
+
+
+def _polar_coordinates(positions: np.ndarray, field_center: tuple) -> tuple:
+    """
+    Returns polar angles in degrees and distances of the points in relation to the center
+
+    :param positions: array of points with coordinates along the last axis
+    :param field_center: a center of a polar coordinates
+    :return: polar angles and distances of the same shape as points
+    """
+    shifts_x = positions[..., 0] - field_center[0]
+    shifts_y = positions[..., 1] - field_center[1]
+    return RAD2DEG * np.arctan2(shifts_y, shifts_x), np.sqrt(shifts_x**2 + shifts_y**2)
+
+
+class FramePreprocessor:
+    """
+    *processing.FramePreprocessor* class converts video frames to the detector input in one
+    pass: optional crop to the arena's bounding box, contrast scaling through a 256-entry
+    lookup table and conversion to grayscale. Output images are written to buffers reused
+    by the following frames of the same thread, so an image is valid until the next call
+    """
+    def __init__(self, scale_parameters: tuple = (1, 0), grayscale: bool = True,
+                 crop: tuple = None, scale_grayscale: bool = False):
+        """
+        :param scale_parameters: pixels absolute scaling parameters
+        :param grayscale: convert frames to grayscale, as the detector does itself
+        :param crop: (x_0, y_0, x_1, y_1) area of frames to keep, None to keep whole frames
+        :param scale_grayscale: scale frames after the grayscale conversion, a third of the
+            pixels are scaled but intensities saturate and round after the channels are mixed,
+            so detections differ from the colour scaling unless scale parameters are (1, 0)
+        """
+        self._alpha, self._beta = scale_parameters
+        self._grayscale = grayscale
+        self._scale_grayscale = scale_grayscale
+        self._crop = None if crop is None else tuple(int(value) for value in crop)
+        self._identity = self._alpha == 1 and self._beta == 0
+        # the values cv2.convertScaleAbs gives for each pixel intensity
+        self._lut = cv2.convertScaleAbs(np.arange(256, dtype=np.uint8).reshape((1, 256)),
+                                        alpha=self._alpha, beta=self._beta)
+        self._buffers = threading.local()
+
+    @property
+    def offset(self) -> np.ndarray:
+        """
+        Position of the preprocessed image's origin in the frame
+        """
+        if self._crop is None:
+            return np.zeros(2, dtype=np.float32)
+        return np.array(self._crop[:2], dtype=np.float32)
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Returns the preprocessed frame
+
+        :param frame: BGR or grayscale frame
+        :return: detector input image
+        """
+        if self._crop is not None:
+            x_0, y_0, x_1, y_1 = self._crop
+            frame = frame[y_0:y_1, x_0:x_1]
+        if self._grayscale and self._scale_grayscale and frame.ndim == 3:
+            frame = self._to_grayscale(frame)
+        if not self._identity:
+            frame = cv2.LUT(frame, self._lut, dst=self._buffer(frame.shape))
+        if self._grayscale and frame.ndim == 3:
+            frame = self._to_grayscale(frame)
+        return frame
+
+    def restore(self, corners: list) -> list:
+        """
+        Returns markers corners detected in the preprocessed image in the frame coordinates
+
+        :param corners: markers corners in the *cv2.aruco.detectMarkers* format
+        :return: shifted corners
+        """
+        if self._crop is None:
+            return corners
+        offset = self.offset
+        return [marker_corners + offset for marker_corners in corners]
+
+    def _to_grayscale(self, frame: np.ndarray) -> np.ndarray:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._buffer(frame.shape[:2]))
+
+    def _buffer(self, shape: tuple) -> np.ndarray:
+        buffers = self._buffers.__dict__
+        if shape not in buffers:
+            buffers[shape] = np.empty(shape, dtype=np.uint8)
+        return buffers[shape]
+
+
+class _MarkerTracker:
+    """
+    Detects markers in small windows around the positions predicted from the previous frames.
+    The whole frame is searched until all the expected markers are found, whenever a tracked
+    marker is lost and each *redetect_every* frames
+    """
+    def __init__(self,
+                 processor,
+                 ignore_codes: tuple,
+                 bots_number: int,
+                 window_scale: float,
+                 redetect_every: int):
+        self._processor = processor
+        self._ignore_codes = set(ignore_codes)
+        self._bots_number = bots_number
+        self._window_scale = window_scale
+        self._redetect_every = redetect_every
+        self._tracks = {}
+        self._frames_since_detection = 0
+
+    def detect(self, frame: np.ndarray) -> tuple:
+        """
+        Returns corners and ids of the markers detected in the frame
+
+        :param frame: frame to process
+        :return: markers corners and ids in the *cv2.aruco.detectMarkers* format
+        """
+        if self._tracks and len(self._tracks) >= self._bots_number\
+                and self._frames_since_detection < self._redetect_every:
+            found = self._detect_in_windows(frame)
+            if found is not None:
+                self._frames_since_detection += 1
+                self._update(found)
+                ids = np.array([[marker_id] for marker_id in found], dtype=np.int32)
+                return list(found.values()), ids
+        corners, ids = self._processor._detect_markers(frame)
+        self._frames_since_detection = 0
+        found = {}
+        if ids is not None:
+            for marker_corners, marker_id in zip(corners, ids.flatten().tolist()):
+                if marker_id not in self._ignore_codes:
+                    found.setdefault(marker_id, marker_corners)
+        self._update(found)
+        return corners, ids
+
+    def _detect_in_windows(self, frame: np.ndarray):
+        """
+        Returns corners of the markers found in the windows around the predicted positions
+        or None if any of the tracked markers was lost
+        """
+        height, width = frame.shape[:2]
+        found = {}
+        for marker_id, (center, previous_center, side) in self._tracks.items():
+            if marker_id in found:
+                continue
+            shift = center - previous_center
+            predicted = center + shift
+            half_size = self._window_scale * side + np.abs(shift).max()
+            x_0 = max(int(predicted[0] - half_size), 0)
+            y_0 = max(int(predicted[1] - half_size), 0)
+            x_1 = min(int(predicted[0] + half_size) + 1, width)
+            y_1 = min(int(predicted[1] + half_size) + 1, height)
+            if x_1 <= x_0 or y_1 <= y_0:
+                return None
+            corners, ids = self._processor._detect_markers(frame[y_0:y_1, x_0:x_1],
+                                                           coarse=False)
+            if ids is None:
+                return None
+            offset = np.array([x_0, y_0], dtype=np.float32)
+            for marker_corners, window_id in zip(corners, ids.flatten().tolist()):
+                if window_id not in self._ignore_codes:
+                    found.setdefault(window_id, marker_corners + offset)
+            if marker_id not in found:
+                return None
+        return found
+
+    def _update(self, found: dict) -> None:
+        tracks = {}
+        for marker_id, marker_corners in found.items():
+            points = marker_corners.reshape((4, 2)).astype(float)
+            center = points.mean(axis=0)
+            side = np.linalg.norm(points[0] - points[1])
+            previous_center = self._tracks[marker_id][0] if marker_id in self._tracks else center
+            tracks[marker_id] = (center, previous_center, side)
+        self._tracks = tracks
+
+
+def _releasing_video(method):
+    """
+    Wraps a calibration method to release the video when the method returns, the session
+    reopens it at the next frame to decode when more frames are needed
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.release()
+    return wrapper
+
+
+class CalibrationSession:
+    """
+    *processing.CalibrationSession* class decodes the first frames of a video and detects
+    markers in them once, so the calibration methods of *Processor* share the decoded frames
+    and detections. Frames are decoded lazily, only as many as the methods need, and only
+    the detections and the first frame are kept in memory. The video is released after each
+    calibration method
+    """
+    def __init__(self, processor, scale_parameters: tuple = (1, 0), frames_number: int = 100):
+        """
+        :param processor: processor with the video and the detector settings
+        :param scale_parameters: pixels absolute scaling parameters
+        :param frames_number: number of the first frames to use
+        """
+        self._processor = processor
+        self._preprocessor = processor.frame_preprocessor(scale_parameters)
+        self._frames_number = frames_number
+        self._video_capture = None
+        self._first_frame = None
+        self._detections = []
+        self._exhausted = False
+
+    @property
+    @_releasing_video
+    def first_frame(self) -> np.ndarray:
+        """
+        First frame of the video, None if it can not be read
+        """
+        if self._first_frame is None:
+            next(self.detections(), None)
+        return self._first_frame
+
+    def detections(self):
+        """
+        Yields markers detected in the first frames, decoding the frames not decoded yet
+
+        :return: generator of (corners, ids) pairs, corners in the *cv2.aruco.detectMarkers*
+            format and ids as a vector
+        """
+        i_frame = 0
+        while True:
+            if i_frame < len(self._detections):
+                yield self._detections[i_frame]
+                i_frame += 1
+                continue
+            if self._exhausted or not self._decode_next():
+                return
+
+    def release(self) -> None:
+        """
+        Releases the video, it is reopened if the following calls need more frames
+        """
+        if self._video_capture is not None:
+            self._video_capture.release()
+            self._video_capture = None
+
+    def close(self) -> None:
+        """
+        Releases the video, the detections made so far are kept and no more frames are decoded
+        """
+        self.release()
+        self._exhausted = True
+
+    @_releasing_video
+    def field_center_auto(self,
+                          first_line_markers: tuple,
+                          second_line_markers: tuple,
+                          robust: bool = True) -> tuple:
+        """
+        Return center of the field calculated as the intersection of two lines which were
+        defined by two pairs of markers
+
+        :param first_line_markers: markers IDs to define the first line
+        :param second_line_markers: markers IDs to define the second line
+        :param robust: take the median of the centers found in all the frames where the markers
+            are visible instead of the center found in the first such frame
+        :return: field's center
+        """
+        markers = tuple(first_line_markers) + tuple(second_line_markers)
+        centers = []
+        for corners, ids in self.detections():
+            if not set(markers).issubset(set(ids.tolist())):
+                continue
+            points = []
+            for marker_id in markers:
+                (top_left, top_right, bottom_right, bottom_left)\
+                    = corners[np.where(ids == marker_id)[0][0]].reshape((4, 2))
+                points.append(((top_left[0] + bottom_right[0]) // 2,
+                               (top_left[1] + bottom_right[1]) // 2))
+            centers.append(self._processor._lines_intersection((points[0], points[1]),
+                                                               (points[2], points[3])))
+            if not robust:
+                break
+        if not centers: # pragma: no cover
+            return None
+        if not robust:
+            return centers[0]
+        return tuple(float(value) for value in np.median(centers, axis=0))
+
+    @_releasing_video
+    def metric_constant(self,
+                        marker_size: float,
+                        robust: bool = True,
+                        marker_ids: tuple = None) -> float:
+        """
+        Returns factor that scale distances in pixel on video to distances in centimeters
+
+        :param marker_size: used ArUco marker size in centimeters
+        :param robust: take the median side of the markers in all the frames instead of
+            the upper side of the first marker in the first frame
+        :param marker_ids: markers of the given size to take the median over, all by default
+        :return: scaling factor
+        """
+        if not robust:
+            for corners, _ in self.detections():
+                if len(corners) == 0: # pragma: no cover
+                    return None
+                (top_left, top_right, bottom_right, bottom_left) = corners[0].reshape((4, 2))
+                top_right = (int(top_right[0]), int(top_right[1]))
+                top_left = (int(top_left[0]), int(top_left[1]))
+                return marker_size / calc_distance(top_left, top_right)
+            return None # pragma: no cover
+
+        sides = []
+        for corners, ids in self.detections():
+            if marker_ids is not None:
+                corners = [marker_corners for marker_corners, marker_id in zip(corners, ids)
+                           if marker_id in marker_ids]
+            if len(corners) == 0:
+                continue
+            points = np.concatenate(corners).reshape((-1, 4, 2))
+            sides.append(np.linalg.norm(points - np.roll(points, 1, axis=1), axis=2).ravel())
+        if not sides: # pragma: no cover
+            return None
+        return marker_size / float(np.median(np.concatenate(sides)))
+
+    def _decode_next(self) -> bool:
+        """
+        Decodes the next frame and detects markers in it, returns whether it succeeded
+        """
+        if len(self._detections) >= self._frames_number:
+            self.close()
+            return False
+        if self._video_capture is None:
+            self._video_capture = cv2.VideoCapture(self._processor._filename)
+            if self._detections:
+                self._video_capture.set(cv2.CAP_PROP_POS_FRAMES, len(self._detections))
+        success, frame = self._video_capture.read()
+        if not success:
+            self.close()
+            return False
+        if self._first_frame is None:
+            self._first_frame = frame
+        corners, ids = self._processor._detect_markers(self._preprocessor(frame), coarse=False)
+        ids = np.zeros(0, dtype=np.int32) if ids is None else ids.flatten()
+        self._detections.append((self._preprocessor.restore(corners), ids))
+        return True
+
+
 class Processor:
     """
     *processing.Processor* class provides interface for processing of experiment videos
@@ -72,8 +574,30 @@ class Processor:
         self._cartesian_kinematics = None
         self._polar_kinematics = None
         self._time = None
+        self._aruco_dictionary_name = "DICT_7X7_1000"
         self._aruco_dictionary = cv2.aruco.Dictionary_get(cv2.aruco.DICT_7X7_1000)
         self._aruco_parameters = cv2.aruco.DetectorParameters_create()
+        self._tracking = None
+        self._coarse_scale = None
+        self._cache = None
+        self._preprocessing = {"grayscale": True, "crop": None, "scale_grayscale": False}
+        self._calibration = None
+
+    def __getstate__(self) -> dict:
+        # OpenCV detector objects can not be pickled, they are rebuilt on unpickling,
+        # results of the previous runs are not needed by the workers
+        state = self.__dict__.copy()
+        del state["_aruco_dictionary"]
+        state["_calibration"] = None
+        state["_cartesian_kinematics"] = None
+        state["_polar_kinematics"] = None
+        state["_aruco_parameters"] = _detector_parameters_to_dict(self._aruco_parameters)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._aruco_dictionary = cv2.aruco.Dictionary_get(ARUCO_DICT[self._aruco_dictionary_name])
+        self._aruco_parameters = _detector_parameters_from_dict(state["_aruco_parameters"])
 
     def set_filename(self, filename: str) -> None: # pragma: no cover
         """
@@ -88,8 +612,181 @@ class Processor:
         :param dict_name: the name of the dict
         """
         if dict_name in ARUCO_DICT.keys():
+            self._aruco_dictionary_name = dict_name
             self._aruco_dictionary = cv2.aruco.Dictionary_get(ARUCO_DICT[dict_name])
 
+    def set_tracking(self,
+                     enabled: bool = True,
+                     window_scale: float = 2.0,
+                     redetect_every: int = 50) -> None:
+        """
+        Enable tracking mode: markers are searched only in the windows around their positions
+        predicted from the previous frames, the whole frame is searched if a marker is lost
+        and periodically to catch newly appeared markers
+
+        :param enabled: use tracking mode
+        :param window_scale: half-size of a search window in marker sides
+        :param redetect_every: number of frames between whole frame searches
+        """
+        if enabled:
+            self._tracking = (window_scale, redetect_every)
+        else:
+            self._tracking = None
+
+    def set_coarse_detection(self, scale: float = 0.5) -> None:
+        """
+        Enable coarse-to-fine detection: markers are searched in the frame downscaled by the
+        given factor and their corners are refined on the full resolution frame
+
+        :param scale: downscaling factor from 0 to 1, None or 1 to disable
+        """
+        if scale is None or scale >= 1:
+            self._coarse_scale = None
+        elif scale <= 0: # pragma: no cover
+            raise ValueError("Downscaling factor must be positive")
+        else:
+            self._coarse_scale = scale
+
+    def set_preprocessing(self,
+                          grayscale: bool = True,
+                          crop: tuple = None,
+                          scale_grayscale: bool = False) -> None:
+        """
+        Set frames preprocessing before the detection. Grayscale frames are cheaper to pass to
+        the detector, which works with grayscale images anyway, and cropping to the arena skips
+        the pixels without bots
+
+        :param grayscale: convert frames to grayscale before the detection
+        :param crop: (x_0, y_0, x_1, y_1) arena's bounding box in pixels, None for whole frames
+        :param scale_grayscale: scale frames after the grayscale conversion, which is faster
+            but changes detections unless scale parameters are (1, 0)
+        """
+        self._preprocessing = {"grayscale": grayscale,
+                               "crop": None if crop is None else [int(value) for value in crop],
+                               "scale_grayscale": scale_grayscale}
+
+    def frame_preprocessor(self, scale_parameters: tuple) -> FramePreprocessor:
+        """
+        Returns preprocessing stage with the processor's settings
+
+        :param scale_parameters: pixels absolute scaling parameters
+        :return: frames preprocessor
+        """
+        return FramePreprocessor(scale_parameters, **self._preprocessing)
+
+    def set_cache(self, directory: str, max_size: int = 1 << 30) -> None:
+        """
+        Enable persistent cache of raw detections: frames already processed with the same
+        video, dictionary, scaling and detector parameters are not detected again
+
+        :param directory: cache directory, None to disable the cache
+        :param max_size: cache size limit in bytes, the least recently used videos are evicted
+        """
+        if directory is None:
+            self._cache = None
+        else:
+            self._cache = DetectionCache(directory, max_size)
+
+    def autotune_detector(self,
+                          bots_number: int,
+                          ignore_codes: tuple = (),
+                          scale_parameters: tuple = (1, 0),
+                          samples_number: int = 20,
+                          target_recall: float = 0.95,
+                          search_space: list = None,
+                          apply: bool = True,
+                          ) -> tuple:
+        """
+        Searches for the fastest ArUco detector parameters which still find all the bots on the
+        target fraction of frames sampled evenly over the video. The groups of the search space
+        are tried one after another: each option of a group is combined with the best values
+        found so far and the fastest one reaching the target recall is kept (the one with the
+        highest recall if none reaches it), a faster option has to be at least 5% faster
+
+        :param bots_number: number of bots in video
+        :param ignore_codes: markers to ignore while recognition
+        :param scale_parameters: pixels absolute scaling parameters
+        :param samples_number: number of frames to sample
+        :param target_recall: fraction of the sampled frames where exactly *bots_number* bots
+            have to be found
+        :param search_space: list of groups of alternative parameters values,
+            *DETECTOR_SEARCH_SPACE* by default
+        :param apply: use the found parameters for the following processing
+        :return: found parameters values and the report: list of tried candidates with their
+            *parameters*, *ms_per_frame* and *recall*
+        """
+
+        video_capture = cv2.VideoCapture(self._filename)
+        frames_number = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_numbers = sorted(set(np.linspace(1, frames_number, samples_number)
+                                   .astype(int).tolist()))
+        preprocessor = self.frame_preprocessor(scale_parameters)
+        images = [preprocessor(frame).copy()
+                  for _, frame in read_frames(video_capture, frame_numbers, "seek")
+                  if frame is not None]
+        video_capture.release()
+        if not images: # pragma: no cover
+            raise ValueError("Can not read frames of the video")
+        ignored = set(ignore_codes)
+
+        report = []
+        evaluated = {}
+
+        def evaluate(values: dict) -> tuple:
+            key = json.dumps(values, sort_keys=True)
+            if key not in evaluated:
+                parameters = _detector_parameters_from_dict(values)
+                found_all, start_time = 0, time.perf_counter()
+                for image in images:
+                    _, ids, _ = cv2.aruco.detectMarkers(image, self._aruco_dictionary,
+                                                        parameters=parameters)
+                    found = set() if ids is None else set(ids.flatten().tolist()) - ignored
+                    found_all += len(found) == bots_number
+                ms_per_frame = 1000 * (time.perf_counter() - start_time) / len(images)
+                evaluated[key] = (ms_per_frame, found_all / len(images))
+                report.append({"parameters": values,
+                               "ms_per_frame": evaluated[key][0],
+                               "recall": evaluated[key][1]})
+            ms_per_frame, recall = evaluated[key]
+            return -min(recall, target_recall), ms_per_frame
+
+        best = _detector_parameters_to_dict(self._aruco_parameters)
+        best_score = evaluate(best)
+        for group in DETECTOR_SEARCH_SPACE if search_space is None else search_space:
+            for option in group:
+                candidate = dict(best, **option)
+                score = evaluate(candidate)
+                # a faster candidate has to win by a margin larger than the timing noise
+                if score[0] < best_score[0] or (score[0] == best_score[0]
+                                                and score[1] < 0.95 * best_score[1]):
+                    best, best_score = candidate, score
+
+        if apply:
+            self._aruco_parameters = _detector_parameters_from_dict(best)
+        return best, report
+
+    def save_detector_parameters(self, filename: str) -> None:
+        """
+        Saves ArUco dictionary name and detector parameters to a JSON file
+
+        :param filename: the path
+        """
+        with open(filename, 'w') as file:
+            json.dump({"dictionary": self._aruco_dictionary_name,
+                       "detector_parameters": _detector_parameters_to_dict(self._aruco_parameters)},
+                      file, indent=4, sort_keys=True)
+
+    def load_detector_parameters(self, filename: str) -> None:
+        """
+        Loads ArUco dictionary name and detector parameters saved by *save_detector_parameters*
+
+        :param filename: the path
+        """
+        with open(filename, 'r') as file:
+            profile = json.load(file)
+        self.set_aruco_dict(profile["dictionary"])
+        self._aruco_parameters = _detector_parameters_from_dict(profile["detector_parameters"])
+
     def get_time(self) -> int: # pragma: no cover
         """
         Returns the time parameter
@@ -105,7 +802,16 @@ class Processor:
                              get_each: int,
                              ignore_codes: tuple,
                              scale_parameters: tuple,
-                             ) -> list:
+                             decode_mode: str = "sequential",
+                             n_jobs: int = 1,
+                             n_threads: int = 1,
+                             queue_size: int = 16,
+                             interpolate: bool = False,
+                             as_array: bool = False,
+                             checkpoint_directory: str = None,
+                             checkpoint_every: int = 500,
+                             resume: bool = False,
+                             ):
         """
         Returns cartesian kinematics for particles in video with given processing parameters
 
@@ -115,64 +821,349 @@ class Processor:
         :param get_each: frames decimation frequency
         :param ignore_codes: markers to ignore while recognition
         :param scale_parameters: pixels absolute scaling parameters
+        :param decode_mode: *seek* to reposition the video before each processed frame or
+            *sequential* to decode the range in one pass skipping decimated frames
+        :param n_jobs: number of worker processes, each one processes its own contiguous part
+            of the frames range (-1 to use all CPU cores)
+        :param n_threads: number of detection threads (per process), the video is decoded
+            ahead by a separate reader thread if more than one
+        :param queue_size: number of decoded frames the reader may keep ahead of detection
+        :param interpolate: fill gaps between two recognitions of a bot by linear interpolation
+            instead of its next recognized position
+        :param as_array: return *kinematics.KinematicsArray* instead of list
+        :param checkpoint_directory: directory to save raw detections to while processing,
+            so an interrupted run can be resumed
+        :param checkpoint_every: number of detected frames in each checkpoint chunk
+            (per process)
+        :param resume: reuse detections from the checkpoint of an interrupted run with
+            the same video and settings instead of starting it over
         :return: list of frame-by-frame particles cartesian kinematic
         """
 
-        alpha, beta = scale_parameters
         video_capture = cv2.VideoCapture(self._filename)
+        start_frame, finish_frame = frame_range(video_capture, begin_frame, end_frame)
+        video_capture.release()
+        frame_numbers = range(start_frame, finish_frame + 1, get_each)
 
-        if begin_frame < 1: # pragma: no cover
-            start_frame = 1
-        else:
-            start_frame = begin_frame
+        checkpoint = None
+        if checkpoint_directory is not None:
+            checkpoint = (DetectionCache(checkpoint_directory, max_size=None), checkpoint_every)
+            if not resume:
+                settings = self._detection_settings(scale_parameters, ignore_codes, bots_number)
+                checkpoint[0].remove(checkpoint[0].key(self._filename, settings))
 
-        frames_number = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if n_jobs < 0:
+            n_jobs = os.cpu_count()
+        n_jobs = max(min(n_jobs, len(frame_numbers)), 1)
 
-        if end_frame > frames_number: # pragma: no cover
-            finish_frame = frames_number
+        if n_jobs == 1:
+            raw_cart_kin = self._raw_cartesian_kinematics(frame_numbers, ignore_codes,
+                                                          scale_parameters, decode_mode,
+                                                          n_threads, queue_size, bots_number,
+                                                          checkpoint)
         else:
-            finish_frame = end_frame
-
-        raw_cart_kin = []
-        for current_frame in tqdm(range(start_frame, finish_frame + 1, get_each)):
-            video_capture.set(cv2.CAP_PROP_POS_FRAMES, current_frame - 1)
-            success, frame = video_capture.read()
-            if not success: # pragma: no cover
-                raw_cart_kin.append([])
-                continue
-            frame_converted = cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
-            raw_cart_kin_for_frame = self._raw_cartesian_kinematics_from_frame(frame_converted,
-                                                                               ignore_codes)
-            raw_cart_kin.append(raw_cart_kin_for_frame)
+            shard_size = -(-len(frame_numbers) // n_jobs)
+            shards = [(self, frame_numbers[i_shard:i_shard + shard_size], ignore_codes,
+                       scale_parameters, decode_mode, n_threads, queue_size, bots_number,
+                       checkpoint)
+                      for i_shard in range(0, len(frame_numbers), shard_size)]
+            with mp.Pool(n_jobs) as pool:
+                raw_cart_kin_shards = list(tqdm(pool.imap(_raw_cartesian_kinematics_shard, shards),
+                                                total=len(shards)))
+            raw_cart_kin = [raw_cart_kin_for_frame
+                            for raw_cart_kin_shard in raw_cart_kin_shards
+                            for raw_cart_kin_for_frame in raw_cart_kin_shard]
 
-        completed_cart_kin = self._fill_gaps_in_raw_kinematics(bots_number, raw_cart_kin)
+        completed_cart_kin = self._fill_gaps_in_raw_kinematics(bots_number, raw_cart_kin,
+                                                               interpolate)
         self._cartesian_kinematics = completed_cart_kin
         self._time = len(completed_cart_kin)
+        if as_array:
+            return KinematicsArray.from_list(completed_cart_kin)
         return completed_cart_kin
 
+    def iter_kinematics(self,
+                        bots_number: int,
+                        begin_frame: int,
+                        end_frame: int,
+                        get_each: int,
+                        ignore_codes: tuple,
+                        scale_parameters: tuple,
+                        decode_mode: str = "sequential",
+                        n_threads: int = 1,
+                        queue_size: int = 16,
+                        lookahead: int = 100,
+                        ):
+        """
+        Yields cartesian kinematics frame by frame while the video is being processed.
+        Unrecognized bots are filled by their positions in the next *lookahead* frames,
+        frames which can not be completed this way are skipped. Memory usage does not depend
+        on the video length
+
+        :param bots_number: number of bots in video
+        :param begin_frame: frame to begin the processing
+        :param end_frame: frame to end the processing
+        :param get_each: frames decimation frequency
+        :param ignore_codes: markers to ignore while recognition
+        :param scale_parameters: pixels absolute scaling parameters
+        :param decode_mode: *seek* or *sequential*
+        :param n_threads: number of detection threads
+        :param queue_size: number of decoded frames the reader may keep ahead of detection
+        :param lookahead: number of next frames to search unrecognized bots in
+        :return: generator of (frame number, particles cartesian kinematic) pairs
+        """
+
+        video_capture = cv2.VideoCapture(self._filename)
+        start_frame, finish_frame = frame_range(video_capture, begin_frame, end_frame)
+        video_capture.release()
+        frame_numbers = range(start_frame, finish_frame + 1, get_each)
+
+        raw_cart_kin_iterator = self._iter_raw_cartesian_kinematics(frame_numbers,
+                                                                    ignore_codes,
+                                                                    scale_parameters,
+                                                                    decode_mode,
+                                                                    n_threads,
+                                                                    queue_size,
+                                                                    bots_number)
+        yield from self._fill_gaps_in_raw_kinematics_stream(bots_number,
+                                                            raw_cart_kin_iterator,
+                                                            lookahead)
+
+    def _raw_cartesian_kinematics(self,
+                                  frame_numbers: range,
+                                  ignore_codes: tuple,
+                                  scale_parameters: tuple,
+                                  decode_mode: str,
+                                  n_threads: int = 1,
+                                  queue_size: int = 16,
+                                  bots_number: int = 0,
+                                  checkpoint: tuple = None,
+                                  progress: bool = True,
+                                  ) -> list:
+        """
+        Returns raw cartesian kinematics for the given frames of the video
+
+        :param frame_numbers: frames to process
+        :param ignore_codes: markers to ignore while recognition
+        :param scale_parameters: pixels absolute scaling parameters
+        :param decode_mode: *seek* or *sequential*
+        :param n_threads: number of detection threads
+        :param queue_size: number of decoded frames the reader may keep ahead of detection
+        :param bots_number: number of bots expected in each frame
+        :param checkpoint: detections storage and number of frames in each its chunk
+        :param progress: show progress bar
+        :return: list of raw cartesian kinematics, empty for unread frames
+        """
+
+        raw_cart_kin_iterator = self._iter_raw_cartesian_kinematics(frame_numbers,
+                                                                    ignore_codes,
+                                                                    scale_parameters,
+                                                                    decode_mode,
+                                                                    n_threads,
+                                                                    queue_size,
+                                                                    bots_number,
+                                                                    checkpoint)
+        return [raw_cart_kin_for_frame
+                for _, raw_cart_kin_for_frame in tqdm(raw_cart_kin_iterator,
+                                                      total=len(frame_numbers),
+                                                      disable=not progress)]
+
+    def _iter_raw_cartesian_kinematics(self,
+                                       frame_numbers: range,
+                                       ignore_codes: tuple,
+                                       scale_parameters: tuple,
+                                       decode_mode: str,
+                                       n_threads: int = 1,
+                                       queue_size: int = 16,
+                                       bots_number: int = 0,
+                                       checkpoint: tuple = None,
+                                       ):
+        """
+        Yields raw cartesian kinematics for the given frames of the video in the frames order.
+        With several threads the video is decoded ahead by a separate reader thread while
+        the detection runs in a pool of threads
+
+        :param frame_numbers: frames to process
+        :param ignore_codes: markers to ignore while recognition
+        :param scale_parameters: pixels absolute scaling parameters
+        :param decode_mode: *seek* or *sequential*
+        :param n_threads: number of detection threads
+        :param queue_size: number of decoded frames the reader may keep ahead of detection
+        :param bots_number: number of bots expected in each frame
+        :param checkpoint: detections storage and number of frames in each its chunk,
+            the frames already saved there are not detected again
+        :return: generator of (frame number, raw cartesian kinematics) pairs
+        """
+
+        tracker = None
+        if self._tracking is not None:
+            if n_threads > 1:
+                raise ValueError("Tracking mode processes frames one after another, "
+                                 "it can not be combined with n_threads > 1")
+            tracker = _MarkerTracker(self, ignore_codes, bots_number, *self._tracking)
+
+        cached_detections, uncached_detections, unsaved_detections = {}, {}, {}
+        if self._cache is not None or checkpoint is not None:
+            storage = self._cache if self._cache is not None else checkpoint[0]
+            settings = self._detection_settings(scale_parameters, ignore_codes, bots_number)
+            cache_key = storage.key(self._filename, settings)
+        if self._cache is not None:
+            cached_detections = self._cache.load(cache_key)
+        if checkpoint is not None:
+            cached_detections.update(checkpoint[0].load(cache_key))
+        frames_to_detect = [current_frame for current_frame in frame_numbers
+                            if current_frame not in cached_detections]
+
+        detections_iterator = self._iter_detections(frames_to_detect, scale_parameters,
+                                                    decode_mode, n_threads, queue_size, tracker)
+        try:
+            for current_frame in frame_numbers:
+                detections = cached_detections.get(current_frame)
+                if detections is None:
+                    _, detections = next(detections_iterator)
+                    if detections is None: # pragma: no cover
+                        yield current_frame, []
+                        continue
+                    if self._cache is not None:
+                        uncached_detections[current_frame] = detections
+                        if len(uncached_detections) >= CACHE_CHUNK_FRAMES:
+                            self._cache.save(cache_key, uncached_detections)
+                            uncached_detections = {}
+                    if checkpoint is not None:
+                        unsaved_detections[current_frame] = detections
+                        if len(unsaved_detections) >= checkpoint[1]:
+                            checkpoint[0].save(cache_key, unsaved_detections)
+                            unsaved_detections = {}
+                corners, ids = unpack_detections(detections)
+                yield current_frame, self._kinematics_from_markers(corners, ids, ignore_codes)
+        finally:
+            detections_iterator.close()
+            if checkpoint is not None:
+                checkpoint[0].save(cache_key, unsaved_detections)
+            if self._cache is not None:
+                self._cache.save(cache_key, uncached_detections)
+
+    def _iter_detections(self,
+                         frame_numbers,
+                         scale_parameters: tuple,
+                         decode_mode: str,
+                         n_threads: int,
+                         queue_size: int,
+                         tracker=None,
+                         ):
+        """
+        Yields markers detected in the given frames of the video in the frames order
+
+        :param frame_numbers: frames to process
+        :param scale_parameters: pixels absolute scaling parameters
+        :param decode_mode: *seek* or *sequential*
+        :param n_threads: number of detection threads
+        :param queue_size: number of decoded frames the reader may keep ahead of detection
+        :param tracker: markers tracker to use instead of the whole frame detection
+        :return: generator of (frame number, packed detections or None for unread frames) pairs
+        """
+
+        preprocessor = self.frame_preprocessor(scale_parameters)
+
+        def detect_frame(frame: np.ndarray) -> tuple:
+            if frame is None: # pragma: no cover
+                return None
+            return self._detect_frame(frame, preprocessor, tracker)
+
+        video_capture = cv2.VideoCapture(self._filename)
+        frames = read_frames(video_capture, frame_numbers, decode_mode)
+        try:
+            if n_threads > 1:
+                yield from _ordered_pipeline(frames, detect_frame, n_threads, queue_size)
+            else:
+                for current_frame, frame in frames:
+                    yield current_frame, detect_frame(frame)
+        finally:
+            video_capture.release()
+
+    def _detect_frame(self, frame: np.ndarray, preprocessor: FramePreprocessor,
+                      tracker=None) -> tuple:
+        """
+        Returns markers detected in the frame
+
+        :param frame: frame to process
+        :param preprocessor: frames preprocessor
+        :param tracker: markers tracker to use instead of the whole frame detection
+        :return: packed detections in the frame coordinates
+        """
+        frame_prepared = preprocessor(frame)
+        if tracker is None:
+            corners, ids = pack_detections(*self._detect_markers(frame_prepared))
+        else:
+            corners, ids = pack_detections(*tracker.detect(frame_prepared))
+        return corners + preprocessor.offset, ids
+
+    def _detection_settings(self,
+                            scale_parameters: tuple,
+                            ignore_codes: tuple = (),
+                            bots_number: int = 0) -> dict:
+        """
+        Returns all settings which affect detected markers
+
+        :param scale_parameters: pixels absolute scaling parameters
+        :param ignore_codes: markers to ignore while recognition, they affect the markers
+            found by the tracker
+        :param bots_number: number of bots expected in each frame, it chooses between the
+            tracker windows and the whole frame detection
+        :return: JSON-serializable settings
+        """
+        detector_parameters = _detector_parameters_to_dict(self._aruco_parameters)
+        # OpenCV fills it with its default value on the first detection
+        detector_parameters.pop("minSideLengthCanonicalImg", None)
+        settings = {
+            "dictionary": self._aruco_dictionary_name,
+            "detector_parameters": detector_parameters,
+            "scale_parameters": list(scale_parameters),
+            "coarse_scale": self._coarse_scale,
+            "tracking": self._tracking,
+            "preprocessing": self._preprocessing,
+        }
+        if self._tracking is not None:
+            settings["ignore_codes"] = sorted(int(code) for code in ignore_codes)
+            settings["bots_number"] = bots_number
+        return settings
+
     @staticmethod
-    def polar_kinematics(cartesian_kinematics: list, field_center: tuple) -> list:
+    def polar_kinematics(cartesian_kinematics, field_center: tuple, inplace: bool = False):
         """
         Returns kinematics extended by a polar angle
         (from 0 to 360 degrees clockwise in relation to X-axis)
         and a distance from field center for each particle
 
-        :param cartesian_kinematics: cartesian kinematics of a system
+        :param cartesian_kinematics: cartesian kinematics of a system, list
+            or *kinematics.KinematicsArray*
         :param field_center: a center of a polar coordinates
-        :return: polar system's kinematics
+        :param inplace: add polar coordinates to the given kinematics instead of a copy
+        :return: polar system's kinematics of the same type
         """
 
-        polar_kinematics = deepcopy(cartesian_kinematics)
-        for i_frame in tqdm(range(len(polar_kinematics))):
-            for i_bot in range(len(polar_kinematics[i_frame])):
-                polar_kinematics[i_frame][i_bot] = [
-                    polar_kinematics[i_frame][i_bot][0],
-                    polar_kinematics[i_frame][i_bot][1],
-                    polar_kinematics[i_frame][i_bot][2],
-                    calc_angle(field_center, polar_kinematics[i_frame][i_bot][2]),
-                    calc_distance(field_center, polar_kinematics[i_frame][i_bot][2])
-                ]
-        return polar_kinematics
+        if isinstance(cartesian_kinematics, KinematicsArray):
+            polar_angles, distances = _polar_coordinates(cartesian_kinematics.positions,
+                                                         field_center)
+            if not inplace:
+                return cartesian_kinematics.with_polar(polar_angles, distances)
+            cartesian_kinematics.polar_angles = polar_angles
+            cartesian_kinematics.distances = distances
+            return cartesian_kinematics
+
+        positions = np.array([bot[2] for frame in cartesian_kinematics for bot in frame],
+                             dtype=float).reshape((-1, 2))
+        polar_angles, distances = _polar_coordinates(positions, field_center)
+        polar_angles, distances = iter(polar_angles.tolist()), iter(distances.tolist())
+
+        if inplace:
+            for frame in cartesian_kinematics:
+                for bot in frame:
+                    bot[3:] = [next(polar_angles), next(distances)]
+            return cartesian_kinematics
+
+        return [[[bot[0], bot[1], bot[2], next(polar_angles), next(distances)] for bot in frame]
+                for frame in cartesian_kinematics]
 
     def field_center_manual(self) -> tuple: # pragma: no cover
         """
@@ -180,11 +1171,7 @@ class Processor:
 
         :return: clicked point coordinates
         """
-        video_capture = cv2.VideoCapture(self._filename)
-        success, frame = video_capture.read()
-        while not success:
-            success, frame = video_capture.read()
-        center = self._center_of_image(frame)
+        center = self._center_of_image(self.calibration_session().first_frame)
         return center
 
     @staticmethod
@@ -202,10 +1189,30 @@ class Processor:
         t_2 = delta_2 / delta
         return p_2[0] + t_2 * s_2[0], p_2[1] + t_2 * s_2[1]
 
+    def calibration_session(self,
+                            scale_parameters: tuple = (1, 0),
+                            frames_number: int = 100) -> "CalibrationSession":
+        """
+        Returns calibration session of the video: the first frames are decoded and markers are
+        detected in them once for all calibration methods called with the same parameters
+
+        :param scale_parameters: pixels absolute scaling parameters
+        :param frames_number: number of the first frames to use
+        :return: calibration session
+        """
+        key = (self._filename, frames_number,
+               json.dumps(self._detection_settings(scale_parameters), sort_keys=True))
+        if self._calibration is None or self._calibration[0] != key:
+            if self._calibration is not None:
+                self._calibration[1].close()
+            self._calibration = (key, CalibrationSession(self, scale_parameters, frames_number))
+        return self._calibration[1]
+
     def field_center_auto(self,
                           first_line_markers: tuple,
                           second_line_markers: tuple,
-                          scale_parameters: tuple) -> tuple:
+                          scale_parameters: tuple,
+                          robust: bool = False) -> tuple:
         """
         Return center of the field calculated as the intersection of two lines which were defined by
         two pairs of markers
@@ -213,95 +1220,98 @@ class Processor:
         :param first_line_markers: markers IDs to define the first line
         :param second_line_markers: markers IDs to define the second line
         :param scale_parameters: pixels absolute scaling parameters
+        :param robust: take the median of the centers found in the first 100 frames instead of
+            the center found in the first frame where the markers are visible
         :return: field's center
         """
-        alpha, beta = scale_parameters
-        video_capture = cv2.VideoCapture(self._filename)
-        poses = []
-        n_frames_to_try = min(100, int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT)))
-        for i_frame in range(n_frames_to_try):
-            success, frame = video_capture.read()
-            while not success: # pragma: no cover
-                success, frame = video_capture.read()
-            frame_converted = cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
-            (corners, ids, rejected) = cv2.aruco.detectMarkers(
-                frame_converted, self._aruco_dictionary, parameters=self._aruco_parameters
-            )
-            ids = ids.flatten()
-            if set(first_line_markers + second_line_markers).issubset(set(ids.tolist())):
-                idx_1 = np.where(ids == first_line_markers[0])
-                (top_left, top_right, bottom_right, bottom_left)\
-                    = corners[idx_1[0][0]].reshape((4, 2))
-                center_1 = ((top_left[0] + bottom_right[0]) // 2,
-                            (top_left[1] + bottom_right[1]) // 2)
-                idx_2 = np.where(ids == first_line_markers[1])
-                (top_left, top_right, bottom_right, bottom_left)\
-                    = corners[idx_2[0][0]].reshape((4, 2))
-                center_2 = ((top_left[0] + bottom_right[0]) // 2,
-                            (top_left[1] + bottom_right[1]) // 2)
-                idx_3 = np.where(ids == second_line_markers[0])
-                (top_left, top_right, bottom_right, bottom_left)\
-                    = corners[idx_3[0][0]].reshape((4, 2))
-                center_3 = ((top_left[0] + bottom_right[0]) // 2,
-                            (top_left[1] + bottom_right[1]) // 2)
-                idx_4 = np.where(ids == second_line_markers[1])
-                (top_left, top_right, bottom_right, bottom_left)\
-                    = corners[idx_4[0][0]].reshape((4, 2))
-                center_4 = ((top_left[0] + bottom_right[0]) // 2,
-                            (top_left[1] + bottom_right[1]) // 2)
-                poses.append((center_1, center_2))
-                poses.append((center_3, center_4))
-                break
-        if not poses: # pragma: no cover
-            return None
-        center = self._lines_intersection(poses[0], poses[1])
-        return center
-
-
+        return self.calibration_session(scale_parameters).field_center_auto(first_line_markers,
+                                                                            second_line_markers,
+                                                                            robust)
 
-    def metric_constant(self, marker_size: float, scale_parameters: tuple) -> float:
+    def metric_constant(self,
+                        marker_size: float,
+                        scale_parameters: tuple,
+                        robust: bool = False,
+                        marker_ids: tuple = None) -> float:
         """
         Returns factor that scale distances in pixel on video to distances in centimeters
 
         :param marker_size: used ArUco marker size in centimeters
         :param scale_parameters: pixels absolute scaling parameters
+        :param robust: take the median side of all the markers in the first 100 frames instead
+            of the upper side of the first marker in the first frame
+        :param marker_ids: markers of the given size to take the median over, all by default
         :return: scaling factor
         """
+        return self.calibration_session(scale_parameters).metric_constant(marker_size, robust,
+                                                                          marker_ids)
 
-        alpha, beta = scale_parameters
-        video_capture = cv2.VideoCapture(self._filename)
-        success, frame = video_capture.read()
-        while not success: # pragma: no cover
-            success, frame = video_capture.read()
-        frame_converted = cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
-        (corners, ids, rejected) = cv2.aruco.detectMarkers(
-            frame_converted, self._aruco_dictionary, parameters=self._aruco_parameters
-        )
-        if len(corners) == 0: # pragma: no cover
-            return None
-        marker_corners = corners[0]
-        (top_left, top_right, bottom_right, bottom_left) = marker_corners.reshape((4, 2))
-        top_right = (int(top_right[0]), int(top_right[1]))
-        top_left = (int(top_left[0]), int(top_left[1]))
-        metric_constant = marker_size / calc_distance(top_left, top_right)
-        return metric_constant
+    def _detect_markers(self, frame: np.ndarray, coarse: bool = True) -> tuple:
+        """
+        Returns corners and ids of the markers detected in the whole frame
+
+        :param frame: frame to process
+        :param coarse: allow coarse-to-fine detection if it is enabled
+        :return: markers corners and ids in the *cv2.aruco.detectMarkers* format
+        """
+        scale = self._coarse_scale
+        if not coarse or scale is None:
+            (corners, ids, rejected) = cv2.aruco.detectMarkers(frame,
+                                                               self._aruco_dictionary,
+                                                               parameters=self._aruco_parameters
+                                                               )
+            return corners, ids
+
+        # area interpolation is precise but slow for fractional factors
+        interpolation = cv2.INTER_AREA if scale <= 0.5 else cv2.INTER_LINEAR
+        frame_small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=interpolation)
+        (corners, ids, rejected) = cv2.aruco.detectMarkers(frame_small,
+                                                           self._aruco_dictionary,
+                                                           parameters=self._aruco_parameters
+                                                           )
+        if ids is None:
+            return corners, ids
+        # pixel centers of the downscaled frame are mapped back to the full resolution ones
+        corners = np.concatenate(corners).reshape((-1, 2))
+        corners = ((corners + 0.5) / scale - 0.5).astype(np.float32)
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        window = int(np.ceil(1 / scale)) + 1
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 30, 0.01)
+        cv2.cornerSubPix(gray, corners, (window, window), (-1, -1), criteria)
+        return list(corners.reshape((-1, 1, 4, 2))), ids
 
     def _raw_cartesian_kinematics_from_frame(self,
                                              frame: np.ndarray,
                                              ignore_codes: tuple,
+                                             tracker=None,
                                              ) -> list: # pragma: no cover
         """
         Returns raw cartesian kinematics for particles in frame
 
         :param frame: frame to process
+        :param ignore_codes: markers to ignore while recognition
+        :param tracker: markers tracker to use instead of the whole frame detection
         :return: raw cartesian kinematics for the given frame
         """
         if frame is None:
             return []
-        (corners, ids, rejected) = cv2.aruco.detectMarkers(frame,
-                                                           self._aruco_dictionary,
-                                                           parameters=self._aruco_parameters
-                                                           )
+        if tracker is None:
+            corners, ids = self._detect_markers(frame)
+        else:
+            corners, ids = tracker.detect(frame)
+        return self._kinematics_from_markers(corners, ids, ignore_codes)
+
+    @staticmethod
+    def _kinematics_from_markers(corners: list, ids: np.ndarray, ignore_codes: tuple)\
+            -> list: # pragma: no cover
+        """
+        Returns raw cartesian kinematics for the detected markers
+
+        :param corners: markers corners
+        :param ids: markers ids
+        :param ignore_codes: markers to ignore while recognition
+        :return: raw cartesian kinematics sorted by markers ids
+        """
         raw_kinematics_for_frame = []
         recognized_markers_number = len(corners)
         for i in range(recognized_markers_number):
@@ -350,60 +1360,156 @@ class Processor:
         return center[-1]
 
     @staticmethod
-    def _fill_gaps_in_raw_kinematics(bots_number: int, raw_cartesian_kinematics: list)\
-            -> list: # pragma: no cover
+    def _fill_gaps_in_raw_kinematics(bots_number: int,
+                                     raw_cartesian_kinematics: list,
+                                     interpolate: bool = False,
+                                     ) -> list: # pragma: no cover
         """
         Returns cartesian kinematics with filling gaps from unrecognized bots
         by they future positions
 
         :param bots_number: total number of particles in video
         :param raw_cartesian_kinematics: raw Cartesian kinematics
+        :param interpolate: fill gaps between two recognitions of a bot by linear interpolation
+            of its position and orientation
         :return: Cartesian kinematics with filled gaps
         """
-        raw_kinematics = deepcopy(raw_cartesian_kinematics)
+        frames_number = len(raw_cartesian_kinematics)
+        frames_lengths = [len(raw_kinematics_for_frame)
+                          for raw_kinematics_for_frame in raw_cartesian_kinematics]
+        best_recognized_frame_number = int(np.argmax(frames_lengths))
+        top_recognized_bots_number = frames_lengths[best_recognized_frame_number]
+
+        if top_recognized_bots_number > bots_number:
+            raise ValueError('Number of recognized markers exceeded the expected value. '
+                             'Kinematics processing was aborted!')
+        if top_recognized_bots_number < bots_number:
+            raise ValueError('Number of recognized markers did not reach the expected value. '
+                             'Kinematics processing was aborted!')
 
-        frames_number = len(raw_kinematics)
-        best_recognized_frame_number = 0
+        total_ids = list(dict.fromkeys(bot[0] for bot
+                                       in raw_cartesian_kinematics[best_recognized_frame_number]))
+        id_columns = {bot_id: i_column for i_column, bot_id in enumerate(total_ids)}
 
-        for i in range(1, frames_number):
-            if len(raw_kinematics[i]) > len(raw_kinematics[best_recognized_frame_number]):
-                best_recognized_frame_number = i
+        # presence[i_frame, i_column] is the position of the bot in the raw frame or -1
+        presence = np.full((frames_number, len(total_ids)), -1, dtype=np.int64)
+        for i_frame, raw_kinematics_for_frame in enumerate(raw_cartesian_kinematics):
+            for i_bot in range(len(raw_kinematics_for_frame) - 1, -1, -1):
+                i_column = id_columns.get(raw_kinematics_for_frame[i_bot][0])
+                if i_column is not None:
+                    presence[i_frame, i_column] = i_bot
 
-        top_recognized_bots_number = len(raw_kinematics[best_recognized_frame_number])
+        # nearest frames where each bot is recognized, frames_number or -1 if there are none
+        frame_indices = np.arange(frames_number)[:, np.newaxis]
+        next_recognized = np.where(presence >= 0, frame_indices, frames_number)
+        next_recognized = np.minimum.accumulate(next_recognized[::-1], axis=0)[::-1]
+        if interpolate:
+            previous_recognized = np.where(presence >= 0, frame_indices, -1)
+            previous_recognized = np.maximum.accumulate(previous_recognized, axis=0)
 
-        assert  top_recognized_bots_number <= bots_number, 'Number of recognized markers exceeded the expected value. Kinematics processing was aborted!'
-        assert  top_recognized_bots_number >= bots_number, 'Number of recognized markers did not reach the expected value. Kinematics processing was aborted!'
+        complete_kinematics = []
+        for i_frame, raw_kinematics_for_frame in enumerate(raw_cartesian_kinematics):
+            kinematics_for_frame = list(raw_kinematics_for_frame)
+            if len(kinematics_for_frame) != bots_number:
+                for i_column in np.flatnonzero(presence[i_frame] < 0):
+                    i_next_frame = next_recognized[i_frame, i_column]
+                    if i_next_frame == frames_number:
+                        continue
+                    next_bot = raw_cartesian_kinematics[i_next_frame][
+                        presence[i_next_frame, i_column]]
+                    if interpolate and previous_recognized[i_frame, i_column] >= 0:
+                        i_previous_frame = previous_recognized[i_frame, i_column]
+                        previous_bot = raw_cartesian_kinematics[i_previous_frame][
+                            presence[i_previous_frame, i_column]]
+                        weight = (i_frame - i_previous_frame) / (i_next_frame - i_previous_frame)
+                        kinematics_for_frame.append(
+                            Processor._interpolate_bot(previous_bot, next_bot, weight))
+                    else:
+                        kinematics_for_frame.append(next_bot)
+            if len(kinematics_for_frame) == bots_number:
+                complete_kinematics.append(sorted(kinematics_for_frame))
+        return complete_kinematics
 
-        total_ids = np.array(raw_kinematics[best_recognized_frame_number])[:, 0]
-        for i_frame in range(frames_number):
-            if len(raw_kinematics[i_frame]) != bots_number:
-                if len(raw_kinematics[i_frame]) == 0:
-                    current_ids = np.array([])
+    @staticmethod
+    def _interpolate_bot(first_bot: list, second_bot: list, weight: float) -> list:
+        """
+        Returns kinematics of a bot linearly interpolated between two recognitions,
+        the orientation is interpolated along the shortest arc
+
+        :param first_bot: bot's kinematics at the beginning of the gap
+        :param second_bot: bot's kinematics at the end of the gap
+        :param weight: relative position inside the gap from 0 to 1
+        :return: interpolated bot's kinematics
+        """
+        angle_change = (second_bot[1] - first_bot[1] + 180) % 360 - 180
+        angle = (first_bot[1] + weight * angle_change) % 360
+        position = (first_bot[2][0] + weight * (second_bot[2][0] - first_bot[2][0]),
+                    first_bot[2][1] + weight * (second_bot[2][1] - first_bot[2][1]))
+        return [first_bot[0], angle, position]
+
+    @staticmethod
+    def _fill_gaps_in_raw_kinematics_stream(bots_number: int,
+                                            raw_cartesian_kinematics,
+                                            lookahead: int):
+        """
+        Yields cartesian kinematics with filling gaps from unrecognized bots by their positions
+        in the next *lookahead* frames. Bots ids are taken from the first completely
+        recognized frame
+
+        :param bots_number: total number of particles in video
+        :param raw_cartesian_kinematics: iterable of (frame number, raw kinematics) pairs
+        :param lookahead: number of next frames to search unrecognized bots in
+        :return: generator of (frame number, cartesian kinematics with filled gaps) pairs
+        """
+        buffer = deque()
+        total_ids = None
+        finished = False
+        raw_iterator = iter(raw_cartesian_kinematics)
+
+        while buffer or not finished:
+            if not finished:
+                try:
+                    frame_number, raw_kinematics_for_frame = next(raw_iterator)
+                except StopIteration:
+                    finished = True
                 else:
-                    current_ids = np.array(raw_kinematics[i_frame])[:, 0]
-                difference = list(set(total_ids) - set(current_ids))
-                for i_absent_bot in range(len(difference)):
-                    for i_next_frame in range(i_frame + 1, frames_number):
-                        bot_searched_out = False
-                        if len(raw_kinematics[i_next_frame]) == 0:
-                            new_bots_ids = np.array([])
-                        else:
-                            new_bots_ids = np.array(raw_kinematics[i_next_frame])[:, 0]
-                        if difference[i_absent_bot] not in set(new_bots_ids):
+                    if len(raw_kinematics_for_frame) > bots_number:
+                        raise ValueError('Number of recognized markers exceeded the expected '
+                                         'value. Kinematics processing was aborted!')
+                    if total_ids is None and len(raw_kinematics_for_frame) == bots_number:
+                        total_ids = [bot[0] for bot in raw_kinematics_for_frame]
+                    bots_by_id = {}
+                    for bot in raw_kinematics_for_frame:
+                        bots_by_id.setdefault(bot[0], bot)
+                    buffer.append((frame_number, raw_kinematics_for_frame, bots_by_id))
+
+            while buffer:
+                final = finished or len(buffer) > lookahead
+                if total_ids is None:
+                    if not final:
+                        break
+                    # the first recognized frame is too far to fill this one
+                    buffer.popleft()
+                    continue
+                frame_number, raw_kinematics_for_frame, bots_by_id = buffer[0]
+                kinematics_for_frame = list(raw_kinematics_for_frame)
+                if len(kinematics_for_frame) != bots_number:
+                    for bot_id in total_ids:
+                        if bot_id in bots_by_id:
                             continue
-                        for i_new_bot in range(len(raw_kinematics[i_next_frame])):
-                            if raw_kinematics[i_next_frame][i_new_bot][0] ==\
-                                    difference[i_absent_bot]:
-                                raw_kinematics[i_frame].append(
-                                    raw_kinematics[i_next_frame][i_new_bot])
-                                bot_searched_out = True
+                        for _, _, next_bots_by_id in islice(buffer, 1, None):
+                            if bot_id in next_bots_by_id:
+                                kinematics_for_frame.append(next_bots_by_id[bot_id])
                                 break
-                        if bot_searched_out:
-                            break
-        complete_kinematics = [sorted(raw_kinematics[i_frame].copy())
-                               for i_frame in range(frames_number)
-                               if (len(raw_kinematics[i_frame])) == bots_number]
-        return complete_kinematics
+                if len(kinematics_for_frame) != bots_number and not final:
+                    break
+                buffer.popleft()
+                if len(kinematics_for_frame) == bots_number:
+                    yield frame_number, sorted(kinematics_for_frame)
+
+        if total_ids is None:
+            raise ValueError('Number of recognized markers did not reach the expected value. '
+                             'Kinematics processing was aborted!')
 
     @staticmethod
     def load_p(filename) -> list:
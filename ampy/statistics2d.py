@@ -3,36 +3,55 @@ Module provides analysis of robots positions and each frame, calculating various
 two-dimensional statistical measures
 """
 
-import multiprocessing as mp
-import os
+import functools
+import inspect
 
 import numpy as np
 
+from .backend import Backend, get_backend
+from .kinematics import KinematicsArray, as_kinematics_array
+
 
 RAD2DEG = 180 / np.pi
 DEG2RAD = np.pi / 180
+KNN_BRUTE_FORCE_BOTS = 200
+CHI_4_MEMORY_BUDGET = 256 * 2**20
+METRICS = ("mean_distance_from_center", "mean_polar_angle", "mean_polar_angle_absolute",
+           "mean_cartesian_displacements", "bond_orientation", "chi_4", "cluster_dynamics")
 
 
-def _orientation_angles(kinematics: list) -> list: # pragma: no cover
-    angles = list(np.array(kinematics, dtype=object)[:, :, 1])
+def _orientation_angles(kinematics) -> np.ndarray: # pragma: no cover
+    angles = as_kinematics_array(kinematics).angles
     return angles
 
 
-def _positions(kinematics: list) -> list:
-    positions = list(np.array(kinematics, dtype=object)[:, :, 2])
+def _positions(kinematics) -> np.ndarray:
+    positions = as_kinematics_array(kinematics).positions
     return positions
 
 
-def _polar_angles(kinematics: list) -> np.array:
-    polar_angles = np.array(kinematics, dtype=object)[:, :, 3].T
-    polar_angles_upd = np.array([np.unwrap(polar_angle, period=360) for polar_angle in polar_angles])
-    return np.array(polar_angles_upd)
+def _polar_columns(kinematics) -> KinematicsArray:
+    kinematics_array = as_kinematics_array(kinematics)
+    if not kinematics_array.has_polar: # pragma: no cover
+        raise ValueError("Kinematics must be extended by polar coordinates")
+    return kinematics_array
+
 
-def _distances_from_center(kinematics: list) -> list:
-    distances = list(np.array(kinematics, dtype=object)[:, :, 4])
+def _polar_angles(kinematics) -> np.array:
+    polar_angles = np.ascontiguousarray(_polar_columns(kinematics).polar_angles.T)
+    return np.unwrap(polar_angles, period=360, axis=1)
+
+def _distances_from_center(kinematics) -> np.ndarray:
+    distances = _polar_columns(kinematics).distances
     return distances
 
 
+def _distances(positions_a: np.ndarray, positions_b: np.ndarray) -> np.ndarray:
+    # the same arithmetic as calc_distance, applied to the (..., 2) arrays of points
+    difference = positions_a - positions_b
+    return np.sqrt(difference[..., 0]**2 + difference[..., 1]**2)
+
+
 def _sum_points(p1: tuple, p2: tuple, scale: float = 1) -> tuple: # pragma: no cover
     return (p1[0] + p2[0] * scale,
             p1[1] + p2[1] * scale)
@@ -74,7 +93,7 @@ def mean_distance_from_center(kinematics: list) -> list:
     :return: scalar value for each frame
     """
 
-    mean_distance = np.array(_distances_from_center(kinematics), dtype=float).mean(axis=1).tolist()
+    mean_distance = _distances_from_center(kinematics).mean(axis=1).tolist()
     return mean_distance
 
 
@@ -113,57 +132,155 @@ def mean_cartesian_displacements(kinematics: list):
     """
 
     positions = _positions(kinematics)
-    first_frame_positions = positions[0]
-    mcd = []
-    for i_frame in range(len(positions)):
-        current_frame_positions = positions[i_frame]
-        current_total_cartesian_displacement = 0
-        for i_bot in range(len(first_frame_positions)):
-            current_total_cartesian_displacement += \
-                calc_distance(current_frame_positions[i_bot], first_frame_positions[i_bot])
-        current_mcd = \
-            current_total_cartesian_displacement / len(first_frame_positions)
-        mcd.append(current_mcd)
+    if len(positions) == 0: # pragma: no cover
+        return []
+    # cumulative sum adds bots in order, as the frame loop did, so results are bit-identical
+    displacements = _distances(positions, positions[0])
+    mcd = (np.cumsum(displacements, axis=1)[:, -1] / positions.shape[1]).tolist()
     return mcd
 
 
-def _local_bond_orientation(folds_number: int, bot_position: tuple, neighbours_positions: list):
-    p = 0
-    for neighbour_index in range(len(neighbours_positions)):
-        p += np.exp(1j * folds_number *
-                    calc_angle(bot_position, neighbours_positions[neighbour_index]) * DEG2RAD)
-    return np.absolute(p) / len(neighbours_positions)
+def _exclusive_cumsum(values: np.ndarray) -> np.ndarray:
+    return (np.cumsum(values) - values).astype(np.int64)
+
+
+def _grid(positions: np.ndarray, cell_size: float) -> tuple:
+    """
+    Returns uniform grid of the points: cells of the points, grid shape, points ordered by cells
+    and the start of each cell in that order
+    """
+    cells = np.floor((positions - positions.min(axis=0)) / cell_size).astype(np.int64)
+    grid_shape = cells.max(axis=0) + 1
+    cell_ids = cells[:, 0] * grid_shape[1] + cells[:, 1]
+    order = np.argsort(cell_ids, kind="stable")
+    cell_starts = np.searchsorted(cell_ids[order], np.arange(grid_shape[0] * grid_shape[1] + 1))
+    return cells, grid_shape, order, cell_starts
+
+
+def _block_candidates(grid: tuple, points: np.ndarray, radius: int) -> tuple:
+    """
+    Returns candidates of the points from the square blocks of cells around their cells as one
+    flat array of (point, candidate) pairs: indices in *points*, candidates and their number
+    for each point
+    """
+    cells, grid_shape, order, cell_starts = grid
+    steps = np.arange(-radius, radius + 1)
+    offsets = np.stack(np.meshgrid(steps, steps, indexing="ij"), axis=-1).reshape(-1, 2)
+    block = cells[points][:, None, :] + offsets[None]
+    inside = np.all((block >= 0) & (block < grid_shape), axis=2)
+    block_ids = np.where(inside, block[..., 0] * grid_shape[1] + block[..., 1], 0)
+    begins = cell_starts[block_ids]
+    counts = np.where(inside, cell_starts[block_ids + 1] - begins, 0).ravel()
+    totals = counts.reshape(len(points), -1).sum(axis=1)
+    flat = np.repeat(begins.ravel() - _exclusive_cumsum(counts), counts) + np.arange(counts.sum())
+    queries = np.repeat(np.arange(len(points)), totals)
+    return queries, order[flat], totals
+
+
+def _grid_nearest_neighbours(positions: np.ndarray, neighbours_number: int) -> np.ndarray:
+    """
+    Returns indices of the nearest neighbours of each point found with the uniform grid: points
+    are binned in cells holding about *neighbours_number* points, and the candidates of each
+    point are taken from the square block of cells around its cell. The block is grown only
+    for the points whose neighbours can lie outside of it
+    """
+    N = len(positions)
+    extent = positions.max(axis=0) - positions.min(axis=0)
+    cell_size = max(np.sqrt(extent[0] * extent[1] * neighbours_number / N),
+                    extent.max() * neighbours_number / N, 1e-9)
+    grid = _grid(positions, cell_size)
+    grid_shape = grid[1]
+
+    neighbours = np.empty((N, neighbours_number), dtype=np.int64)
+    pending = np.arange(N)
+    radius = 1
+    while pending.size:
+        queries, candidates, totals = _block_candidates(grid, pending, radius)
+        distances = _distances(positions[candidates], positions[pending][queries])
+        ranking = np.lexsort((candidates, distances, queries))
+        candidates, distances = candidates[ranking], distances[ranking]
+        ranks = np.arange(len(ranking)) - np.repeat(_exclusive_cumsum(totals), totals)
+
+        # points outside of the block are at least radius * cell_size away
+        enough = totals >= neighbours_number
+        last = _exclusive_cumsum(totals) + neighbours_number - 1
+        farthest = np.where(enough, distances[np.minimum(last, len(distances) - 1)], np.inf)
+        resolved = enough & ((farthest < radius * cell_size) | (radius >= grid_shape.max()))
+        selected = resolved[queries] & (ranks < neighbours_number)
+        neighbours[pending[resolved]] = candidates[selected].reshape(-1, neighbours_number)
+        pending = pending[~resolved]
+        radius *= 2
+    return neighbours
+
+
+def _frame_distances(positions: np.ndarray) -> np.ndarray:
+    """
+    Returns (N, N) distances matrix of the frame points if it is small enough for the brute
+    force searches, None otherwise
+    """
+    if len(positions) > KNN_BRUTE_FORCE_BOTS:
+        return None
+    return _distances(positions[:, None], positions[None])
+
+
+def _nearest_neighbours(positions: np.ndarray,
+                        neighbours_number: int,
+                        distances: np.ndarray = None) -> np.ndarray:
+    """
+    Returns (N, k) indices of the k nearest points to each point of the frame, the point itself
+    included. Points at equal distances are ordered by their indices
+
+    :param positions: (N, 2) points of the frame
+    :param neighbours_number: number of neighbours k, at most N are returned
+    :param distances: distances matrix of the frame if already computed
+    :return: indices array
+    """
+    neighbours_number = min(neighbours_number, len(positions))
+    if distances is None:
+        distances = _frame_distances(positions)
+    if distances is not None:
+        return np.argsort(distances, axis=1, kind="stable")[:, :neighbours_number]
+    return _grid_nearest_neighbours(positions, neighbours_number)
+
+
+def _local_bond_orientation(folds_number: int,
+                            positions: np.ndarray,
+                            neighbours: np.ndarray) -> np.ndarray:
+    differences = positions[neighbours] - positions[:, None]
+    angles = RAD2DEG * np.arctan2(differences[..., 1], differences[..., 0])
+    p = np.exp(1j * folds_number * angles * DEG2RAD).sum(axis=1)
+    return np.absolute(p) / neighbours.shape[1]
 
 
 def bond_orientation(kinematics: list,
                      neighbours_number: int,
                      folds_number: int,
-                     get_each: int = 1) -> list:
+                     get_each: int = 1,
+                     return_local: bool = False):
     """
-    Returns bond orientation order parameter
+    Returns bond orientation order parameter. Neighbours of each bot are its nearest bots,
+    the bot itself included
 
     :param kinematics: system's kinematics
     :param neighbours_number: number of neighbours to use in calculations
     :param folds_number: number of folds to use in calculations
     :param get_each: frames decimation frequency
-    :return: list of scalar values
+    :param return_local: return local order parameters of each bot as well
+    :return: list of scalar values, and (frames, bots) array of local values if return_local
     """
 
-    boo = []
-    positions = _positions(kinematics)
-    for i_frame in range(0, len(kinematics), get_each):
-        current_frame_boo = 0
-        current_frame_positions = positions[i_frame]
-        for i_bot in range(len(kinematics[i_frame])):
-            reference_bot_position = current_frame_positions[i_bot]
-            neighbours_positions = list(current_frame_positions.copy())
-            neighbours_positions.sort(key=lambda pos: calc_distance(reference_bot_position, pos))
-            neighbours_positions = neighbours_positions[:neighbours_number]
-            local_boo = \
-                _local_bond_orientation(folds_number, reference_bot_position, neighbours_positions)
-            current_frame_boo += local_boo
-        current_frame_boo /= len(kinematics[i_frame])
-        boo.append(current_frame_boo)
+    positions = _positions(kinematics)[::get_each]
+    local_boo = np.empty(positions.shape[:2])
+    for i_frame, frame_positions in enumerate(positions):
+        neighbours = _nearest_neighbours(frame_positions, neighbours_number)
+        local_boo[i_frame] = _local_bond_orientation(folds_number, frame_positions, neighbours)
+    return _bond_orientation_result(local_boo, return_local)
+
+
+def _bond_orientation_result(local_boo: np.ndarray, return_local: bool):
+    boo = (np.cumsum(local_boo, axis=1)[:, -1] / local_boo.shape[1]).tolist()
+    if return_local:
+        return boo, local_boo
     return boo
 
 
@@ -179,16 +296,76 @@ def chi_4(kinematics: list,
     :return: scalar value
     """
 
-    q_sequence = []
-    N = len(kinematics[0])
-    for i_frame in range(len(kinematics) - tau):
-        q = 0
-        for i_bot in range(N):
-            q += int(a - calc_distance(kinematics[i_frame + tau][i_bot][2],
-                                       kinematics[i_frame][i_bot][2]) >= 0)
-        q /= N
-        q_sequence.append(q)
-    t_corr = N * np.std(q_sequence)
+    positions = _positions(kinematics)
+    t_corr = _chi_4_lag(positions, tau, np.array([a], dtype=float), len(positions))[0]
+    return t_corr
+
+
+def _chi_4_lag(positions: np.ndarray, tau: int, a: np.ndarray, block_frames: int) -> np.ndarray:
+    """
+    Returns chi_4 of one lag for all the sorted thresholds. Displacements are binned between
+    the thresholds, so all the thresholds are counted in one pass over a block of frames
+    """
+    N = positions.shape[1]
+    frames_number = max(len(positions) - tau, 0)
+    # rows of the thresholds are contiguous, so std reduces each one as a single sequence
+    counts = np.empty((len(a), frames_number))
+    for begin in range(0, frames_number, max(block_frames, 1)):
+        end = min(begin + block_frames, frames_number)
+        displacements = _distances(positions[begin + tau:end + tau], positions[begin:end])
+        # a displacement is within the threshold a_j when its bin is not greater than j
+        bins = np.searchsorted(a, displacements, side="left")
+        bins += (len(a) + 1) * np.arange(end - begin)[:, None]
+        histogram = np.bincount(bins.ravel(), minlength=(end - begin) * (len(a) + 1))
+        counts[:, begin:end] = np.cumsum(histogram.reshape(end - begin, -1), axis=1)[:, :-1].T
+    return N * np.std(counts / N, axis=1)
+
+
+def _chi_4_lags(arrays: dict, output: np.ndarray, task: tuple) -> None:
+    i_lag, tau, a, block_frames = task
+    output[i_lag] = _chi_4_lag(arrays["positions"], tau, a, block_frames)
+
+
+def chi_4_sweep(kinematics: list,
+                taus: list,
+                a: list,
+                n_jobs: int = None,
+                memory_budget: int = CHI_4_MEMORY_BUDGET,
+                backend: Backend = None) -> np.ndarray:
+    """
+    Returns spatio-temporal correlation parameter chi_4 for each pair of time and space gaps.
+    Displacements are computed once per lag and all the distances are evaluated on them
+
+    :param kinematics: system's kinematics
+    :param taus: characteristic times in frames
+    :param a: characteristic distances in pixels
+    :param n_jobs: number of worker processes sharing the lags (-1 to use all CPU cores),
+        the backend is used if None
+    :param memory_budget: approximate bytes of working memory of all the workers, frames of
+        each lag are processed in blocks fitting it
+    :param backend: execution backend, the default one if None
+    :return: (len(taus), len(a)) array of scalar values
+    """
+
+    positions = _positions(kinematics)
+    taus = [int(tau) for tau in taus]
+    a = np.asarray(a, dtype=float)
+    order = np.argsort(a, kind="stable")
+    sorted_a = a[order]
+
+    if n_jobs is not None:
+        backend = Backend("serial" if n_jobs == 1 else "process", n_jobs)
+    backend = get_backend(backend)
+    # displacements, their bins and the counts of the thresholds of each frame
+    frame_bytes = 24 * positions.shape[1] + 16 * (len(a) + 1)
+    block_frames = max(memory_budget // (backend.n_jobs * frame_bytes), 1)
+    tasks = [(i_lag, tau, sorted_a, block_frames) for i_lag, tau in enumerate(taus)]
+
+    # whole-array work of a lag is about a hundred times cheaper than Python pairs loops
+    lags = backend.map_shared(_chi_4_lags, {"positions": positions}, tasks, (len(taus), len(a)),
+                              cost=positions.shape[0] * positions.shape[1] / 100)
+    t_corr = np.empty((len(taus), len(a)))
+    t_corr[:, order] = lags
     return t_corr
 
 
@@ -227,18 +404,176 @@ def _clustering_coefficient_frame(data_frame: tuple) -> float: # pragma: no cove
     return cl_coeff
 
 
+def _collision_radius(collide_function) -> float:
+    """
+    Returns contact distance of *_is_collide* or of its partial with the distance bound,
+    None for the other collision functions
+    """
+    if collide_function is _is_collide:
+        return _is_collide.__defaults__[0]
+    if isinstance(collide_function, functools.partial) and collide_function.func is _is_collide \
+            and not collide_function.args and set(collide_function.keywords) <= {"d"}:
+        return collide_function.keywords.get("d", _is_collide.__defaults__[0])
+    return None
+
+
+def _contact_pairs(positions: np.ndarray, d: float, distances: np.ndarray = None) -> tuple:
+    """
+    Returns all the ordered pairs of different points not farther than d from each other,
+    taken from the distances matrix if it is given or found in the 3x3 blocks of the grid
+    cells at least d wide
+    """
+    N = len(positions)
+    if distances is not None:
+        contacts = distances <= d
+        np.fill_diagonal(contacts, False)
+        return np.nonzero(contacts)
+    extent = positions.max(axis=0) - positions.min(axis=0)
+    # wider cells than needed keep the number of the cells about the number of the points
+    cell_size = max(d, np.sqrt(extent[0] * extent[1] / N), extent.max() / N, 1e-9)
+    queries, candidates, _ = _block_candidates(_grid(positions, cell_size), np.arange(N), 1)
+    contacts = (queries != candidates) & (_distances(positions[queries], positions[candidates]) <= d)
+    return queries[contacts], candidates[contacts]
+
+
+def _radius_clustering_coefficient(positions: np.ndarray,
+                                   d: float,
+                                   distances: np.ndarray = None) -> float:
+    """
+    Returns clustering coefficient of the frame contacts graph: triangles of each point are
+    counted as the adjacent pairs among the pairs of its neighbours
+    """
+    N = len(positions)
+    first, second = _contact_pairs(positions, d, distances)
+    order = np.lexsort((second, first))
+    first, second = first[order], second[order]
+    degrees = np.bincount(first, minlength=N)
+    starts = _exclusive_cumsum(degrees)
+
+    # wedges j-i-k pair each neighbour j of the point i with the neighbours k listed after it
+    ranks = np.arange(len(first)) - starts[first]
+    later_numbers = degrees[first] - 1 - ranks
+    wedges_j = np.repeat(np.arange(len(first)), later_numbers)
+    wedges_k = wedges_j + 1 + np.arange(len(wedges_j)) \
+        - np.repeat(_exclusive_cumsum(later_numbers), later_numbers)
+    closing_edges = second[wedges_j] * N + second[wedges_k]
+
+    edges = first * N + second
+    closing = np.minimum(np.searchsorted(edges, closing_edges), max(len(edges) - 1, 0))
+    triangles = np.bincount(first[wedges_j][edges[closing] == closing_edges], minlength=N)
+    c = np.where(degrees > 1, 2 * triangles / np.maximum(degrees * (degrees - 1), 1), 0)
+    cl_coeff = np.cumsum(c)[-1] / N
+    return cl_coeff
+
+
+def _clustering_coefficient_frames(arrays: dict,
+                                   output: np.ndarray,
+                                   task: tuple) -> None: # pragma: no cover
+    start, stop, collide_function = task
+    frames = KinematicsArray(**arrays).frames(start, stop).to_list()
+    for i_frame, kinematics_frame in enumerate(frames, start):
+        output[i_frame] = _clustering_coefficient_frame((kinematics_frame, collide_function))
+
+
 def cluster_dynamics(kinematics: list,
-                     collide_function=_is_collide) -> list:
+                     collide_function=_is_collide,
+                     backend: Backend = None) -> list:
     """
-    Returns collision graph average clustering coefficient
+    Returns collision graph average clustering coefficient. Contacts of the default collision
+    function, or of its *functools.partial* with another distance *d*, are found with a cells
+    grid and their triangles are counted in whole-array operations, other functions are called
+    for each pair of bots
 
     :param kinematics: system's kinematics
     :param collide_function: collision detection function
+    :param backend: execution backend of the other collision functions, the default one
+        if None
     :return: list of scalar values
     """
 
+    d = _collision_radius(collide_function)
+    if d is not None:
+        positions = _positions(kinematics)
+        cl_coeff_seq = [float(_radius_clustering_coefficient(frame_positions, d))
+                        for frame_positions in positions]
+        return cl_coeff_seq
+
+    kinematics = as_kinematics_array(kinematics)
+    backend = get_backend(backend)
+    tasks = [(start, stop, collide_function) for start, stop in backend.ranges(len(kinematics))]
+    cl_coeff_seq = backend.map_shared(_clustering_coefficient_frames, kinematics.columns(), tasks,
+                                      (len(kinematics),),
+                                      cost=len(kinematics) / max(len(tasks), 1)
+                                      * kinematics.bots_number**3)
+    return cl_coeff_seq.tolist()
+
+
+def compute_all(kinematics: list, metrics) -> dict:
+    """
+    Returns several metrics of the module computed together: kinematics is converted to arrays
+    once, polar angles are unwrapped once, and *bond_orientation* and *cluster_dynamics* with
+    the default or radius collision function share one pass over the frames with the distances
+    matrix of each frame computed once
+
+    :param kinematics: system's kinematics, extended by polar coordinates for the polar metrics
+    :param metrics: names of the metrics (the functions of this module) to compute with their
+        default parameters, or dictionary of the names and dictionaries of their parameters
+        besides kinematics
+    :return: dictionary of the results by the metrics names
+    """
+
+    if not isinstance(metrics, dict):
+        metrics = {name: {} for name in metrics}
+    kinematics = as_kinematics_array(kinematics)
+    arguments = {}
+    for name, parameters in metrics.items():
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric '{name}', use some of {METRICS}")
+        bound = inspect.signature(globals()[name]).bind(kinematics, **parameters)
+        bound.apply_defaults()
+        arguments[name] = bound.arguments
+
+    results = {}
+    if "mean_distance_from_center" in arguments:
+        results["mean_distance_from_center"] = mean_distance_from_center(kinematics)
+    if "mean_polar_angle" in arguments or "mean_polar_angle_absolute" in arguments:
+        angles = _polar_angles(kinematics)
+        if "mean_polar_angle" in arguments:
+            results["mean_polar_angle"] = angles.mean(axis=0)
+        if "mean_polar_angle_absolute" in arguments:
+            results["mean_polar_angle_absolute"] = np.abs(angles).mean(axis=0)
+    if "mean_cartesian_displacements" in arguments:
+        results["mean_cartesian_displacements"] = mean_cartesian_displacements(kinematics)
+    if "chi_4" in arguments:
+        results["chi_4"] = chi_4(**arguments["chi_4"])
+
+    bond = arguments.get("bond_orientation")
+    d = None
+    if "cluster_dynamics" in arguments:
+        d = _collision_radius(arguments["cluster_dynamics"]["collide_function"])
+        if d is None:
+            results["cluster_dynamics"] = cluster_dynamics(**arguments["cluster_dynamics"])
+    if bond is None and d is None:
+        return {name: results[name] for name in metrics}
+
+    positions = kinematics.positions
+    get_each = bond["get_each"] if bond is not None else 1
+    local_boo = np.empty((len(positions[::get_each]), kinematics.bots_number))
     cl_coeff_seq = []
-    data = [(kinematics[i_frame], collide_function) for i_frame in range(len(kinematics))]
-    with mp.Pool(max(os.cpu_count() - 1, 1)) as pool:
-        cl_coeff_seq = pool.map(_clustering_coefficient_frame, data)
-    return cl_coeff_seq
+    for i_frame, frame_positions in enumerate(positions):
+        frame_bond = bond is not None and i_frame % get_each == 0
+        if not frame_bond and d is None:
+            continue
+        distances = _frame_distances(frame_positions)
+        if frame_bond:
+            neighbours = _nearest_neighbours(frame_positions, bond["neighbours_number"], distances)
+            local_boo[i_frame // get_each] = _local_bond_orientation(bond["folds_number"],
+                                                                     frame_positions, neighbours)
+        if d is not None:
+            cl_coeff_seq.append(float(_radius_clustering_coefficient(frame_positions, d,
+                                                                     distances)))
+    if bond is not None:
+        results["bond_orientation"] = _bond_orientation_result(local_boo, bond["return_local"])
+    if d is not None:
+        results["cluster_dynamics"] = cl_coeff_seq
+    return {name: results[name] for name in metrics}
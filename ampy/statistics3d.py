@@ -3,11 +3,11 @@ Module provides analysis of robots positions and each frame, calculating various
 three-dimensional statistical measures
 """
 
-from multiprocessing.pool import Pool
-import os
-
 import numpy as np
 
+from .backend import Backend, get_backend
+from .kinematics import KinematicsArray, as_kinematics_array
+
 RAD2DEG = 180 / np.pi
 DEG2RAD = np.pi / 180
 
@@ -43,6 +43,7 @@ def _position_correlation_frame(data_frame: tuple): # pragma: no cover
 def position_correlation(kinematics: list,
                          x_size: int,
                          y_size: int,
+                         backend: Backend = None,
                          ) -> list:
     """
     Returns position correlation matrix
@@ -50,13 +51,11 @@ def position_correlation(kinematics: list,
     :param kinematics: system's kinematics
     :param x_size: window size for X-axis
     :param y_size: window size for Y-axis
+    :param backend: execution backend, the default one if None
     :return: matrix of scalar values per frame
     """
 
-    data = [(kinematics_frame, x_size, y_size) for kinematics_frame in kinematics]
-
-    with Pool(max(os.cpu_count() - 1, 1)) as pool:
-        pc_matrices = pool.map(_position_correlation_frame, data)
+    pc_matrices = _correlation(_position_correlation_frame, kinematics, x_size, y_size, backend)
 
     return pc_matrices
 
@@ -93,6 +92,7 @@ def _orientation_correlation_frame(data_frame: tuple): # pragma: no cover
 def orientation_correlation(kinematics: list,
                             x_size: int,
                             y_size: int,
+                            backend: Backend = None,
                             ) -> list:
     """
     Returns orientation correlation matrix
@@ -100,12 +100,12 @@ def orientation_correlation(kinematics: list,
     :param kinematics: system's kinematics
     :param x_size: window size for X-axis
     :param y_size: window size for Y-axis
+    :param backend: execution backend, the default one if None
     :return: matrix of scalar values per frame
     """
 
-    data = [(kinematics_frame, x_size, y_size) for kinematics_frame in kinematics]
-    with Pool(max(os.cpu_count() - 1, 1)) as pool:
-        oc_matrices = pool.map(_orientation_correlation_frame, data)
+    oc_matrices = _correlation(_orientation_correlation_frame, kinematics, x_size, y_size,
+                               backend)
 
     return oc_matrices
 
@@ -146,6 +146,7 @@ def _velocity_correlation_frame(data_frame: tuple): # pragma: no cover
 def velocity_correlation(kinematics: list,
                          x_size: int,
                          y_size: int,
+                         backend: Backend = None,
                          ) -> list:
     """
     Returns velocity correlation matrix
@@ -153,22 +154,45 @@ def velocity_correlation(kinematics: list,
     :param kinematics: system's kinematics
     :param x_size: window size for X-axis
     :param y_size: window size for Y-axis
+    :param backend: execution backend, the default one if None
     :return: matrix of scalar values per frame
     """
 
-    N = len(kinematics[0])
-    velocities = [[(0, 0) for i in range(N)]]
-    for i_frame in range(1, len(kinematics)):
-        velocities_frame = []
-        for i_bot in range(N):
-            velocities_frame.append((kinematics[i_frame][i_bot][2][0] -
-                                     kinematics[i_frame - 1][i_bot][2][0],
-                                     kinematics[i_frame][i_bot][2][1] -
-                                     kinematics[i_frame - 1][i_bot][2][1]))
-        velocities.append(velocities_frame)
-    data = [(kinematics[i_frame], velocities[i_frame], x_size, y_size)
-            for i_frame in range(1, len(kinematics))]
-    with Pool(max(os.cpu_count() - 1, 1)) as pool:
-        vc_matrices = pool.map(_velocity_correlation_frame, data)
+    vc_matrices = _correlation(_velocity_correlation_frame, kinematics, x_size, y_size, backend)
 
     return vc_matrices
+
+
+def _correlation_frames(arrays: dict, output: np.ndarray, task: tuple) -> None: # pragma: no cover
+    frame_function, start, stop, x_size, y_size = task
+    if frame_function is _velocity_correlation_frame:
+        # velocities of the frame are the displacements from the previous one
+        kinematics = KinematicsArray(**arrays).frames(start, stop + 1)
+        frames = kinematics.to_list()[1:]
+        velocities = np.diff(kinematics.positions, axis=0).tolist()
+        data = [(kinematics_frame, [tuple(velocity) for velocity in velocities_frame],
+                 x_size, y_size)
+                for kinematics_frame, velocities_frame in zip(frames, velocities)]
+    else:
+        frames = KinematicsArray(**arrays).frames(start, stop).to_list()
+        data = [(kinematics_frame, x_size, y_size) for kinematics_frame in frames]
+    for i_frame, data_frame in enumerate(data, start):
+        output[i_frame] = frame_function(data_frame)
+
+
+def _correlation(frame_function, kinematics, x_size: int, y_size: int, backend: Backend) -> list:
+    """
+    Returns correlation matrices of the frames computed by the backend, kinematics arrays are
+    shared with the workers which write the matrices to the shared output
+    """
+    kinematics = as_kinematics_array(kinematics)
+    backend = get_backend(backend)
+    frames_number = kinematics.frames_number
+    if frame_function is _velocity_correlation_frame:
+        frames_number = max(frames_number - 1, 0)
+    tasks = [(frame_function, start, stop, x_size, y_size)
+             for start, stop in backend.ranges(frames_number)]
+    matrices = backend.map_shared(_correlation_frames, kinematics.columns(), tasks,
+                                  (frames_number, y_size, x_size),
+                                  cost=frames_number / max(len(tasks), 1) * kinematics.bots_number**2)
+    return matrices.tolist()
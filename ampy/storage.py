@@ -0,0 +1,379 @@
+"""
+Module provides binary storage of the system's kinematics: typed arrays with a small header
+which are memory-mapped on loading, so frames ranges and bots subsets are read lazily, and
+compact archives of independently compressed delta-encoded chunks for long-term storage
+"""
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from .kinematics import KinematicsArray, as_kinematics_array
+
+
+MAGIC = b"AMPYKIN1"
+# version 1 files store the frames columns frame by frame, version 2 files bot by bot
+VERSION = 2
+ALIGNMENT = 64
+HEADER_LENGTH_FORMAT = "<I"
+STORAGE_DTYPES = {
+    "ids": "<i8",
+    "angles": "<f8",
+    "positions": "<f8",
+    "polar_angles": "<f8",
+    "distances": "<f8",
+}
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_kinematics(filename: str, kinematics) -> None:
+    """
+    Saves kinematics as typed arrays: ids (N), angles (F, N), positions (F, N, 2) and polar
+    angles and distances (F, N) if they are present, where F is a number of frames and N is
+    a number of bots. Arrays are stored after a header describing them, the frames columns
+    bot by bot, so the whole track of a bot is a contiguous block of each column
+
+    :param filename: the path
+    :param kinematics: list of frame-by-frame kinematics or *KinematicsArray*
+    """
+    kinematics = as_kinematics_array(kinematics)
+    columns = {"ids": kinematics.ids, "angles": kinematics.angles,
+               "positions": kinematics.positions}
+    if kinematics.has_polar:
+        columns["polar_angles"] = kinematics.polar_angles
+        columns["distances"] = kinematics.distances
+    columns = {name: np.ascontiguousarray(column if name == "ids" else np.swapaxes(column, 0, 1),
+                                          dtype=STORAGE_DTYPES[name])
+               for name, column in columns.items()}
+
+    # arrays offsets depend on the header length, which includes the offsets themselves
+    header = {"version": VERSION,
+              "frames_number": kinematics.frames_number,
+              "bots_number": kinematics.bots_number,
+              "arrays": {}}
+    data_offset = 0
+    while True:
+        offset = data_offset
+        for name, column in columns.items():
+            header["arrays"][name] = {"dtype": STORAGE_DTYPES[name],
+                                      "shape": list(column.shape),
+                                      "offset": offset}
+            offset = _aligned(offset + column.nbytes)
+        header_bytes = json.dumps(header).encode()
+        header_size = _aligned(len(MAGIC) + struct.calcsize(HEADER_LENGTH_FORMAT)
+                               + len(header_bytes))
+        if header_size <= data_offset:
+            break
+        data_offset = header_size
+
+    with open(filename, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack(HEADER_LENGTH_FORMAT, len(header_bytes)))
+        file.write(header_bytes)
+        for name, column in columns.items():
+            file.write(b"\0" * (header["arrays"][name]["offset"] - file.tell()))
+            column.tofile(file)
+
+
+def read_header(filename: str) -> dict:
+    """
+    Returns header of a kinematics file checking that the file holds all the arrays
+    it describes
+
+    :param filename: the path
+    :return: dictionary with *frames_number*, *bots_number* and *arrays* description
+    """
+    with open(filename, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not a kinematics file")
+        (header_length,) = struct.unpack(HEADER_LENGTH_FORMAT,
+                                         file.read(struct.calcsize(HEADER_LENGTH_FORMAT)))
+        try:
+            header = json.loads(file.read(header_length).decode())
+        except (UnicodeDecodeError, ValueError):
+            raise ValueError(f"{filename} has a corrupted header") from None
+    if header.get("version", 0) > VERSION:
+        raise ValueError(f"{filename} has unsupported version {header['version']}")
+
+    file_size = os.path.getsize(filename)
+    for name, description in header["arrays"].items():
+        end = description["offset"] + int(np.prod(description["shape"])) \
+            * np.dtype(description["dtype"]).itemsize
+        if end > file_size:
+            raise ValueError(f"{filename} is truncated, array '{name}' is incomplete")
+    return header
+
+
+def load_kinematics(filename: str, mmap_mode: str = "r") -> KinematicsArray:
+    """
+    Loads kinematics saved by *save_kinematics*. Arrays are memory-mapped, so only the parts
+    of the file used by the frames and bots views are read: a bot view reads the bot's blocks
+    only, a frames range reads its part of each bot's block
+
+    :param filename: the path
+    :param mmap_mode: *r* for read-only arrays, *r+* to modify the file in place, *c* for
+        copy-on-write arrays or None to read the whole file to memory
+    :return: columnar kinematics
+    """
+    header = read_header(filename)
+    columns = {}
+    for name, description in header["arrays"].items():
+        shape = tuple(description["shape"])
+        if mmap_mode is None:
+            with open(filename, 'rb') as file:
+                file.seek(description["offset"])
+                columns[name] = np.fromfile(file, dtype=description["dtype"],
+                                            count=int(np.prod(shape))).reshape(shape)
+        elif np.prod(shape) == 0:
+            columns[name] = np.zeros(shape, dtype=description["dtype"])
+        else:
+            columns[name] = np.memmap(filename, dtype=description["dtype"], mode=mmap_mode,
+                                      offset=description["offset"], shape=shape)
+        if name != "ids" and header["version"] >= 2:
+            columns[name] = np.swapaxes(columns[name], 0, 1)
+            if mmap_mode is None:
+                columns[name] = np.ascontiguousarray(columns[name])
+    return KinematicsArray(columns["ids"], columns["angles"], columns["positions"],
+                           columns.get("polar_angles"), columns.get("distances"))
+
+
+ARCHIVE_MAGIC = b"AMPYARC1"
+ARCHIVE_COLUMNS = ("angles", "positions", "polar_angles", "distances")
+DEFAULT_QUANTA = {
+    "angles": 1e-4,
+    "positions": 1e-3,
+    "polar_angles": 1e-4,
+    "distances": 1e-3,
+}
+FULL_TURN = 360
+
+
+def _delta_width(deltas: np.ndarray) -> np.dtype:
+    """
+    Returns the narrowest integer type which holds all the values
+    """
+    if deltas.size == 0:
+        return np.dtype("<i1")
+    low, high = int(deltas.min()), int(deltas.max())
+    for dtype in ("<i1", "<i2", "<i4"):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype("<i8")
+
+
+def _encode_chunk(columns: dict, periods: dict) -> tuple:
+    """
+    Returns compressed chunk and integer widths of its columns. Each column of quantized
+    values is stored as its first frame (64-bit) followed by the frame-to-frame differences
+    of each bot in the narrowest integer type. The differences are stored byte plane by byte
+    plane, which groups their mostly zero high bytes together for the compression
+    """
+    payload, widths = [], {}
+    for name, values in columns.items():
+        deltas = np.diff(values, axis=0)
+        if periods[name] is not None:
+            deltas = (deltas + periods[name] // 2) % periods[name] - periods[name] // 2
+        widths[name] = _delta_width(deltas).str
+        payload.append(values[:1].astype("<i8").tobytes())
+        payload.append(deltas.astype(widths[name]).view(np.uint8)
+                       .reshape((-1, np.dtype(widths[name]).itemsize)).T.tobytes())
+    return zlib.compress(b"".join(payload)), widths
+
+
+def _decode_chunk(data: bytes, frames_number: int, shapes: dict, widths: dict,
+                  periods: dict) -> dict:
+    """
+    Returns quantized columns of a chunk encoded by *_encode_chunk*
+    """
+    data = zlib.decompress(data)
+    columns, offset = {}, 0
+    for name, shape in shapes.items():
+        row_size = int(np.prod(shape))
+        first = np.frombuffer(data, dtype="<i8", count=row_size, offset=offset)
+        offset += first.nbytes
+        width = np.dtype(widths[name])
+        deltas_number = row_size * (frames_number - 1)
+        deltas = np.frombuffer(data, dtype=np.uint8, count=deltas_number * width.itemsize,
+                               offset=offset)
+        offset += deltas.nbytes
+        deltas = np.ascontiguousarray(deltas.reshape((width.itemsize, deltas_number)).T)\
+            .view(width).ravel()
+        values = np.concatenate([first, deltas.astype(np.int64)])
+        values = np.cumsum(values.reshape((frames_number,) + tuple(shape)), axis=0)
+        if periods[name] is not None:
+            values %= periods[name]
+        columns[name] = values
+    return columns
+
+
+def save_archive(filename: str,
+                 kinematics,
+                 chunk_size: int = 1024,
+                 quanta: dict = None) -> None:
+    """
+    Saves kinematics to a compact archive. Values are quantized, angles and positions of each
+    bot are delta-encoded along time in the narrowest fixed-width integers and each chunk of
+    frames is compressed independently, so any chunk can be decoded on its own. Positions
+    which are whole pixels are stored exactly, other values are restored within a half
+    of their quantum (angles modulo 360 degrees)
+
+    :param filename: the path
+    :param kinematics: list of frame-by-frame kinematics or *KinematicsArray*
+    :param chunk_size: number of frames in each chunk
+    :param quanta: quantization steps of the *angles*, *positions*, *polar_angles* and
+        *distances* columns, *DEFAULT_QUANTA* for the missing ones
+    """
+    kinematics = as_kinematics_array(kinematics)
+    quanta = dict(DEFAULT_QUANTA, **(quanta or {}))
+    columns = {"angles": kinematics.angles, "positions": kinematics.positions}
+    if kinematics.has_polar:
+        columns["polar_angles"] = kinematics.polar_angles
+        columns["distances"] = kinematics.distances
+    if quanta["positions"] < 1 and np.array_equal(kinematics.positions,
+                                                  np.round(kinematics.positions)):
+        quanta["positions"] = 1
+
+    quantized, periods = {}, {}
+    for name, values in columns.items():
+        quantized[name] = np.round(values / quanta[name]).astype(np.int64)
+        periods[name] = None
+        if name in ("angles", "polar_angles") and values.size > 0 \
+                and values.min() >= 0 and values.max() < FULL_TURN:
+            period = FULL_TURN / quanta[name]
+            if period == round(period):
+                periods[name] = int(period)
+
+    chunks, blobs, offset = [], [], 0
+    for start in range(0, kinematics.frames_number, chunk_size):
+        stop = min(start + chunk_size, kinematics.frames_number)
+        blob, widths = _encode_chunk({name: values[start:stop]
+                                      for name, values in quantized.items()}, periods)
+        chunks.append({"start": start, "frames_number": stop - start,
+                       "offset": offset, "size": len(blob), "widths": widths})
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = {"version": 1,
+              "frames_number": kinematics.frames_number,
+              "ids": kinematics.ids.tolist(),
+              "columns": {name: {"shape": list(values.shape[1:]), "quantum": quanta[name],
+                                 "period": periods[name]}
+                          for name, values in quantized.items()},
+              "chunks": chunks}
+    header_bytes = json.dumps(header).encode()
+    with open(filename, 'wb') as file:
+        file.write(ARCHIVE_MAGIC)
+        file.write(struct.pack(HEADER_LENGTH_FORMAT, len(header_bytes)))
+        file.write(header_bytes)
+        for blob in blobs:
+            file.write(blob)
+
+
+class ArchiveReader:
+    """
+    *storage.ArchiveReader* class reads kinematics archives saved by *save_archive*,
+    decoding only the chunks of the requested frames
+    """
+    def __init__(self, filename: str):
+        self._filename = filename
+        with open(filename, 'rb') as file:
+            if file.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+                raise ValueError(f"{filename} is not a kinematics archive")
+            (header_length,) = struct.unpack(HEADER_LENGTH_FORMAT,
+                                             file.read(struct.calcsize(HEADER_LENGTH_FORMAT)))
+            try:
+                self._header = json.loads(file.read(header_length).decode())
+            except (UnicodeDecodeError, ValueError):
+                raise ValueError(f"{filename} has a corrupted header") from None
+        self._data_offset = len(ARCHIVE_MAGIC) + struct.calcsize(HEADER_LENGTH_FORMAT) \
+            + header_length
+        self._ids = np.array(self._header["ids"], dtype=np.int64)
+        chunks = self._header["chunks"]
+        if chunks and self._data_offset + chunks[-1]["offset"] + chunks[-1]["size"] \
+                > os.path.getsize(filename):
+            raise ValueError(f"{filename} is truncated")
+
+    @property
+    def frames_number(self) -> int:
+        """
+        Number of frames
+        """
+        return self._header["frames_number"]
+
+    @property
+    def chunks_number(self) -> int:
+        """
+        Number of independently compressed chunks
+        """
+        return len(self._header["chunks"])
+
+    def __len__(self) -> int:
+        return self.frames_number
+
+    def chunk(self, i_chunk: int) -> KinematicsArray:
+        """
+        Returns kinematics of a single chunk
+
+        :param i_chunk: chunk index
+        :return: columnar kinematics of the chunk frames
+        """
+        chunk = self._header["chunks"][i_chunk]
+        with open(self._filename, 'rb') as file:
+            file.seek(self._data_offset + chunk["offset"])
+            data = file.read(chunk["size"])
+        descriptions = self._header["columns"]
+        quantized = _decode_chunk(data, chunk["frames_number"],
+                                  {name: description["shape"]
+                                   for name, description in descriptions.items()},
+                                  chunk["widths"],
+                                  {name: description["period"]
+                                   for name, description in descriptions.items()})
+        columns = {name: values * descriptions[name]["quantum"]
+                   for name, values in quantized.items()}
+        return KinematicsArray(self._ids, columns["angles"], columns["positions"],
+                               columns.get("polar_angles"), columns.get("distances"))
+
+    def read(self, start: int = 0, stop: int = None) -> KinematicsArray:
+        """
+        Returns kinematics of the frames range
+
+        :param start: first frame index
+        :param stop: frame index to stop before, the end of the archive by default
+        :return: columnar kinematics
+        """
+        start, stop, _ = slice(start, stop).indices(self.frames_number)
+        parts = []
+        for i_chunk, chunk in enumerate(self._header["chunks"]):
+            chunk_stop = chunk["start"] + chunk["frames_number"]
+            if chunk_stop <= start or chunk["start"] >= stop:
+                continue
+            parts.append(self.chunk(i_chunk).frames(max(start - chunk["start"], 0),
+                                                    stop - chunk["start"]))
+        if not parts:
+            return self._empty()
+        columns = {name: np.concatenate([getattr(part, name) for part in parts])
+                   for name in ARCHIVE_COLUMNS if getattr(parts[0], name) is not None}
+        return KinematicsArray(self._ids, columns["angles"], columns["positions"],
+                               columns.get("polar_angles"), columns.get("distances"))
+
+    def _empty(self) -> KinematicsArray:
+        bots_number = len(self._ids)
+        has_polar = "polar_angles" in self._header["columns"]
+        polar_column = np.zeros((0, bots_number)) if has_polar else None
+        return KinematicsArray(self._ids, np.zeros((0, bots_number)),
+                               np.zeros((0, bots_number, 2)), polar_column, polar_column)
+
+
+def load_archive(filename: str) -> KinematicsArray:
+    """
+    Loads the whole kinematics archive saved by *save_archive*
+
+    :param filename: the path
+    :return: columnar kinematics
+    """
+    return ArchiveReader(filename).read()
@@ -5,19 +5,19 @@ from tqdm import tqdm
 
 import cv2
 
-def get_video(filename:str, begin_frame:int, end_frame:int, get_each:int) -> list:
-    """
-        Returns a list with the frames of an input video
 
-        :param filename: the path
-        :param bots_number: number of bots in video
-        :param begin_frame: frame to begin the processing
-        :param end_frame: frame to end the processing
-        :param get_each: frames decimation frequency
-        :return: list with the frames of the input video
+DECODE_MODES = ("seek", "sequential")
+
+
+def frame_range(video_capture: cv2.VideoCapture, begin_frame: int, end_frame: int) -> tuple:
     """
+    Returns processing range clipped to the frames available in the video
 
-    video_capture = cv2.VideoCapture(filename)
+    :param video_capture: opened video
+    :param begin_frame: frame to begin the processing
+    :param end_frame: frame to end the processing
+    :return: first and last frames numbers (starting from 1)
+    """
 
     if begin_frame < 1:
         start_frame = 1
@@ -31,12 +31,77 @@ def get_video(filename:str, begin_frame:int, end_frame:int, get_each:int) -> lis
     else:
         finish_frame = end_frame # pragma: no cover
 
+    return start_frame, finish_frame
+
+
+def read_frames(video_capture: cv2.VideoCapture, frame_numbers, decode_mode: str = "seek"):
+    """
+    Yields requested frames of a video. In the *seek* mode the capture is repositioned before
+    each read, in the *sequential* mode the video is decoded in one pass: the frames in between
+    are skipped by cheap *grab* calls and only the requested ones are retrieved
+
+    :param video_capture: opened video
+    :param frame_numbers: increasing frame numbers (starting from 1) to read
+    :param decode_mode: *seek* or *sequential*
+    :return: generator of (frame number, frame) pairs, frame is None if it can not be read
+    """
+
+    if decode_mode not in DECODE_MODES: # pragma: no cover
+        raise ValueError(f"Unknown decode mode '{decode_mode}', expected one of {DECODE_MODES}")
+
+    if decode_mode == "seek":
+        for current_frame in frame_numbers:
+            video_capture.set(cv2.CAP_PROP_POS_FRAMES, current_frame - 1)
+            success, frame = video_capture.read()
+            yield current_frame, frame if success else None
+        return
+
+    position = None
+    exhausted = False
+    for current_frame in frame_numbers:
+        if position is None:
+            video_capture.set(cv2.CAP_PROP_POS_FRAMES, current_frame - 1)
+            position = current_frame
+        while not exhausted and position < current_frame:
+            exhausted = not video_capture.grab()
+            position += 1
+        if exhausted: # pragma: no cover
+            yield current_frame, None
+            continue
+        success = video_capture.grab()
+        position += 1
+        if success:
+            success, frame = video_capture.retrieve()
+        exhausted = not success
+        yield current_frame, frame if success else None
+
+
+def get_video(filename:str,
+              begin_frame:int,
+              end_frame:int,
+              get_each:int,
+              decode_mode:str = "sequential") -> list:
+    """
+        Returns a list with the frames of an input video
+
+        :param filename: the path
+        :param bots_number: number of bots in video
+        :param begin_frame: frame to begin the processing
+        :param end_frame: frame to end the processing
+        :param get_each: frames decimation frequency
+        :param decode_mode: *seek* to reposition before each frame or *sequential*
+            to decode the range in one pass
+        :return: list with the frames of the input video
+    """
+
+    video_capture = cv2.VideoCapture(filename)
+    start_frame, finish_frame = frame_range(video_capture, begin_frame, end_frame)
+
     frames = []
-    raw_cart_kin = []
-    for current_frame in tqdm(range(start_frame, finish_frame + 1, get_each)):
-        video_capture.set(cv2.CAP_PROP_POS_FRAMES, current_frame - 1)
-        success, frame = video_capture.read()
-        if success: # pragma: no cover
+    frame_numbers = range(start_frame, finish_frame + 1, get_each)
+    for _, frame in tqdm(read_frames(video_capture, frame_numbers, decode_mode),
+                         total=len(frame_numbers)):
+        if frame is not None: # pragma: no cover
             frames.append(frame)
     return frames
 
@@ -0,0 +1,115 @@
+"""
+Benchmark of the execution backends of the statistics functions on short and long kinematics:
+a new pool for each call, as the functions did before, against the serial, auto and persistent
+process pool backends, in seconds per call. The process pool receives either the pickled frames
+with the matrices pickled back, or the shared memory arrays and frame ranges
+
+Usage: python benchmarks/bench_backend.py [--bots 30] [--frames 5 200 2000] [--calls 3]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from ampy import backend
+from ampy.kinematics import KinematicsArray
+import ampy.statistics3d as sd3
+
+
+def random_kinematics(frames_number: int, bots_number: int) -> list:
+    """
+    Returns kinematics list of randomly placed and oriented bots
+    """
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0, 300, (frames_number, bots_number, 2)).round()
+    angles = rng.uniform(0, 360, (frames_number, bots_number))
+    return KinematicsArray(np.arange(bots_number), angles, positions).to_list()
+
+
+def new_pool_per_call(kinematics: list) -> list:
+    """
+    Position correlation computed by a new pool, as before the backends
+    """
+    data = [(kinematics_frame, 100, 100) for kinematics_frame in kinematics]
+    with mp.Pool(max(os.cpu_count() - 1, 1)) as pool:
+        return pool.map(sd3._position_correlation_frame, data)
+
+
+def pickled_frames(kinematics: list, execution_backend: backend.Backend) -> list:
+    """
+    Position correlation computed by the backend pool from the pickled frames
+    """
+    data = [(kinematics_frame, 100, 100) for kinematics_frame in kinematics]
+    return execution_backend.map(sd3._position_correlation_frame, data)
+
+
+def frame_sum_matrix(data_frame: tuple) -> list:
+    """
+    Negligible work of a frame returning a window matrix, so only the transport is measured
+    """
+    kinematics_frame, x_size, y_size = data_frame
+    matrix = [[0.0] * x_size for _ in range(y_size)]
+    matrix[0][0] = sum(bot[2][0] for bot in kinematics_frame)
+    return matrix
+
+
+def frames_sum_matrices(arrays: dict, output, task: tuple) -> None:
+    """
+    Negligible work of the frames range written to the shared output
+    """
+    start, stop = task
+    output[start:stop, 0, 0] = arrays["positions"][start:stop, :, 0].sum(axis=1)
+
+
+def seconds_per_call(function, calls_number: int) -> float:
+    """
+    Returns average time of the function call in seconds
+    """
+    start_time = time.perf_counter()
+    for _ in range(calls_number):
+        function()
+    return (time.perf_counter() - start_time) / calls_number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bots", type=int, default=30)
+    parser.add_argument("--frames", type=int, nargs="+", default=[5, 200, 2000])
+    parser.add_argument("--calls", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = [("serial", backend.Backend("serial")), ("auto", backend.Backend("auto")),
+                ("shared", backend.Backend("process"))]
+    print(f"position_correlation, {args.bots} bots, {os.cpu_count()} CPU cores, s/call")
+    print(f"{'frames':>7} {'new pool':>9} {'pickled':>9} "
+          + " ".join(f"{name:>9}" for name, _ in backends))
+    for frames_number in args.frames:
+        kinematics = random_kinematics(frames_number, args.bots)
+        times = [seconds_per_call(lambda: new_pool_per_call(kinematics), args.calls),
+                 seconds_per_call(lambda: pickled_frames(kinematics, backends[-1][1]), args.calls)]
+        for _, execution_backend in backends:
+            times.append(seconds_per_call(
+                lambda: sd3.position_correlation(kinematics, 100, 100, execution_backend),
+                args.calls))
+        print(f"{frames_number:>7} " + " ".join(f"{value:>9.3f}" for value in times))
+
+    print(f"\ntransport only, {args.bots} bots, 100x100 matrices, process pool, s/call")
+    print(f"{'frames':>7} {'pickled':>9} {'shared':>9}")
+    process_backend = backends[-1][1]
+    for frames_number in args.frames:
+        kinematics = random_kinematics(frames_number, args.bots)
+        columns = KinematicsArray.from_list(kinematics).columns()
+        data = [(kinematics_frame, 100, 100) for kinematics_frame in kinematics]
+        times = [seconds_per_call(lambda: process_backend.map(frame_sum_matrix, data), args.calls),
+                 seconds_per_call(lambda: process_backend.map_shared(
+                     frames_sum_matrices, columns, process_backend.ranges(frames_number),
+                     (frames_number, 100, 100)), args.calls)]
+        print(f"{frames_number:>7} " + " ".join(f"{value:>9.3f}" for value in times))
+    backend.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark of *ampy.statistics2d.bond_orientation*: the per-bot sorting loop it replaced, the
+brute force neighbours search and the uniform grid index, in ms/frame
+
+Usage: python benchmarks/bench_bond_orientation.py [--frames 5] [--bots 100 1000 5000]
+                                                   [--neighbours 6]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ampy.kinematics import KinematicsArray
+import ampy.statistics2d as tds
+
+
+def loop_bond_orientation(positions: np.ndarray, neighbours_number: int, folds_number: int) -> list:
+    """
+    Reference loop sorting all the bots by distance for each bot
+    """
+    boo = []
+    for frame_positions in positions:
+        frame_boo = 0
+        for bot_position in frame_positions:
+            neighbours_positions = list(frame_positions.copy())
+            neighbours_positions.sort(key=lambda pos: tds.calc_distance(bot_position, pos))
+            p = 0
+            for neighbour_position in neighbours_positions[:neighbours_number]:
+                p += np.exp(1j * folds_number *
+                            tds.calc_angle(bot_position, neighbour_position) * tds.DEG2RAD)
+            frame_boo += np.absolute(p) / neighbours_number
+        boo.append(frame_boo / len(frame_positions))
+    return boo
+
+
+def ms_per_frame(function, frames_number: int) -> tuple:
+    """
+    Returns the function result and its running time in ms/frame
+    """
+    start_time = time.perf_counter()
+    result = function()
+    return result, 1000 * (time.perf_counter() - start_time) / frames_number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--bots", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--neighbours", type=int, default=6)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    brute_force_bots = tds.KNN_BRUTE_FORCE_BOTS
+    print(f"{args.frames} frames, {args.neighbours} neighbours, ms/frame")
+    print(f"{'bots':>6} {'loop':>9} {'brute':>9} {'grid':>9} {'max diff':>9}")
+    for bots_number in args.bots:
+        positions = rng.uniform(0, 40 * np.sqrt(bots_number), (args.frames, bots_number, 2)).round()
+        kinematics = KinematicsArray(np.arange(bots_number), np.zeros(positions.shape[:2]), positions)
+        loop_time = float("nan")
+        reference = None
+        if bots_number <= 1000:
+            reference, loop_time = ms_per_frame(
+                lambda: loop_bond_orientation(positions, args.neighbours, 6), args.frames)
+        brute, brute_time = None, float("nan")
+        try:
+            if bots_number <= 5000:
+                tds.KNN_BRUTE_FORCE_BOTS = bots_number
+                brute, brute_time = ms_per_frame(
+                    lambda: tds.bond_orientation(kinematics, args.neighbours, 6), args.frames)
+            tds.KNN_BRUTE_FORCE_BOTS = 0
+            grid, grid_time = ms_per_frame(
+                lambda: tds.bond_orientation(kinematics, args.neighbours, 6), args.frames)
+        finally:
+            tds.KNN_BRUTE_FORCE_BOTS = brute_force_bots
+        reference = brute if reference is None else reference
+        difference = float("nan") if reference is None else np.max(np.abs(np.subtract(grid, reference)))
+        print(f"{bots_number:>6} {loop_time:>9.1f} {brute_time:>9.1f} {grid_time:>9.1f} "
+              f"{difference:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark of *ampy.statistics2d.cluster_dynamics*: the pairwise collision calls with the
+triple loop over the adjacency matrix against the grid contacts with the triangles counting,
+in ms/frame
+
+Usage: python benchmarks/bench_cluster_dynamics.py [--frames 2] [--bots 50 200 1000 10000]
+                                                   [--d 300]
+"""
+
+import argparse
+import functools
+import time
+
+import numpy as np
+
+from ampy.kinematics import KinematicsArray
+import ampy.statistics2d as tds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=2)
+    parser.add_argument("--bots", type=int, nargs="+", default=[50, 200, 1000, 10000])
+    parser.add_argument("--d", type=float, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    collide_function = functools.partial(tds._is_collide, d=args.d)
+    print(f"{args.frames} frames, contact distance {args.d}, ms/frame")
+    print(f"{'bots':>6} {'loop':>10} {'grid':>9} {'speedup':>8} {'equal':>6}")
+    for bots_number in args.bots:
+        # about 10 bots in the contact disk of a bot on average
+        side = args.d * np.sqrt(np.pi * bots_number / 10)
+        positions = rng.uniform(0, side, (args.frames, bots_number, 2)).round()
+        kinematics = KinematicsArray(np.arange(bots_number), np.zeros(positions.shape[:2]), positions)
+
+        start_time = time.perf_counter()
+        result = tds.cluster_dynamics(kinematics, collide_function)
+        grid_time = 1000 * (time.perf_counter() - start_time) / args.frames
+
+        loop_time, equal = float("nan"), ""
+        if bots_number <= 200:
+            frames = kinematics.to_list()
+            start_time = time.perf_counter()
+            reference = [tds._clustering_coefficient_frame((frame, collide_function))
+                         for frame in frames]
+            loop_time = 1000 * (time.perf_counter() - start_time) / args.frames
+            equal = str(reference == result)
+        print(f"{bots_number:>6} {loop_time:>10.1f} {grid_time:>9.2f} {loop_time / grid_time:>8.0f} "
+              f"{equal:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark of *ampy.statistics2d.compute_all* against calling the metrics functions one by one
+on the same list kinematics, in seconds
+
+Usage: python benchmarks/bench_compute_all.py [--frames 2000] [--bots 100]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ampy.kinematics import KinematicsArray
+import ampy.statistics2d as tds
+
+
+METRICS = {
+    "mean_distance_from_center": {},
+    "mean_polar_angle": {},
+    "mean_polar_angle_absolute": {},
+    "mean_cartesian_displacements": {},
+    "bond_orientation": {"neighbours_number": 6, "folds_number": 6},
+    "chi_4": {"tau": 60, "a": 5},
+    "cluster_dynamics": {},
+}
+
+
+def random_walk_kinematics(frames_number: int, bots_number: int) -> list:
+    """
+    Returns list kinematics of bots making small random steps, extended by polar coordinates
+    """
+    rng = np.random.default_rng(0)
+    side = 300 * np.sqrt(np.pi * bots_number / 10)
+    positions = rng.uniform(0, side, (bots_number, 2)).round() + np.cumsum(
+        rng.integers(-2, 3, (frames_number, bots_number, 2)), axis=0)
+    shifted = positions - side / 2
+    kinematics = KinematicsArray(np.arange(bots_number), rng.uniform(0, 360, positions.shape[:2]),
+                                 positions)
+    polar_angles = tds.RAD2DEG * np.arctan2(shifted[..., 1], shifted[..., 0]) % 360
+    kinematics = kinematics.with_polar(polar_angles, np.hypot(shifted[..., 0], shifted[..., 1]))
+    return kinematics.to_list()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--bots", type=int, default=100)
+    args = parser.parse_args()
+
+    kinematics = random_walk_kinematics(args.frames, args.bots)
+
+    start_time = time.perf_counter()
+    separate = {name: getattr(tds, name)(kinematics, **parameters)
+                for name, parameters in METRICS.items()}
+    separate_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    fused = tds.compute_all(kinematics, METRICS)
+    fused_time = time.perf_counter() - start_time
+
+    equal = all(np.array_equal(separate[name], fused[name]) for name in METRICS)
+    print(f"{args.frames} frames x {args.bots} bots, {len(METRICS)} metrics")
+    print(f"{'one by one':>12} {separate_time:>8.2f} s")
+    print(f"{'compute_all':>12} {fused_time:>8.2f} s, speedup {separate_time / fused_time:.1f}, "
+          f"equal results {equal}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark of the video decoding modes used by *ampy.processing.Processor*
+
+Usage: python benchmarks/bench_decoding.py [video] [--get-each 1 5 10] [--end-frame N]
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+
+from ampy.utils import DECODE_MODES, frame_range, read_frames
+
+
+DEFAULT_VIDEO = os.path.join(os.path.dirname(__file__), "..", "tests",
+                             "test_processing_files", "test_video.mp4")
+
+
+def decoding_fps(filename: str, end_frame: int, get_each: int, decode_mode: str) -> tuple:
+    """
+    Returns number of decoded frames and decoding speed in frames per second
+
+    :param filename: the path
+    :param end_frame: frame to end the processing
+    :param get_each: frames decimation frequency
+    :param decode_mode: *seek* or *sequential*
+    :return: frames number and frames per second
+    """
+
+    video_capture = cv2.VideoCapture(filename)
+    start_frame, finish_frame = frame_range(video_capture, 1, end_frame)
+    frame_numbers = range(start_frame, finish_frame + 1, get_each)
+    start_time = time.perf_counter()
+    decoded = sum(frame is not None
+                  for _, frame in read_frames(video_capture, frame_numbers, decode_mode))
+    elapsed = time.perf_counter() - start_time
+    video_capture.release()
+    return decoded, decoded / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video", nargs="?", default=DEFAULT_VIDEO)
+    parser.add_argument("--get-each", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--end-frame", type=int, default=10**9)
+    args = parser.parse_args()
+
+    print(f"{'get_each':>8} {'mode':>10} {'frames':>7} {'fps':>9}")
+    for get_each in args.get_each:
+        for decode_mode in DECODE_MODES:
+            decoded, fps = decoding_fps(args.video, args.end_frame, get_each, decode_mode)
+            print(f"{get_each:>8} {decode_mode:>10} {decoded:>7} {fps:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
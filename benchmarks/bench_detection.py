@@ -0,0 +1,98 @@
+"""
+Benchmark of the marker detection modes of *ampy.processing.Processor*: speed in ms/frame
+and accuracy against the whole frame detection
+
+Usage: python benchmarks/bench_detection.py [video] [--end-frame N] [--ignore-codes ...]
+                                            [--scales 0.75 0.5]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from ampy.processing import Processor, _MarkerTracker
+from ampy.utils import get_video
+
+
+DEFAULT_VIDEO = os.path.join(os.path.dirname(__file__), "..", "tests",
+                             "test_processing_files", "test_video.mp4")
+
+
+def run_mode(frames: list, processor: Processor, ignore_codes: tuple, tracking: bool) -> tuple:
+    """
+    Returns raw kinematics of each frame and the detection time in ms/frame
+
+    :param frames: decoded frames
+    :param processor: configured processor
+    :param ignore_codes: markers to ignore while recognition
+    :param tracking: use tracking mode
+    :return: raw kinematics and ms/frame
+    """
+
+    tracker = None
+    if tracking:
+        bots_number = max(len(processor._raw_cartesian_kinematics_from_frame(frame, ignore_codes))
+                          for frame in frames[:10])
+        tracker = _MarkerTracker(processor, ignore_codes, bots_number, 2.0, 50)
+    start_time = time.perf_counter()
+    raw_kinematics = [processor._raw_cartesian_kinematics_from_frame(frame, ignore_codes, tracker)
+                      for frame in frames]
+    elapsed = time.perf_counter() - start_time
+    return raw_kinematics, 1000 * elapsed / len(frames)
+
+
+def accuracy(reference: list, result: list) -> tuple:
+    """
+    Returns recall, maximal position error in pixels and maximal angle error in degrees
+    of the result in relation to the reference raw kinematics
+    """
+
+    matched, total, position_error, angle_error = 0, 0, 0.0, 0.0
+    for reference_frame, result_frame in zip(reference, result):
+        result_bots = {bot[0]: bot for bot in result_frame}
+        for marker_id, angle, position in reference_frame:
+            total += 1
+            if marker_id not in result_bots:
+                continue
+            matched += 1
+            _, result_angle, result_position = result_bots[marker_id]
+            position_error = max(position_error,
+                                 float(np.hypot(position[0] - result_position[0],
+                                                position[1] - result_position[1])))
+            angle_error = max(angle_error, abs((angle - result_angle + 180) % 360 - 180))
+    return matched / max(total, 1), position_error, angle_error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video", nargs="?", default=DEFAULT_VIDEO)
+    parser.add_argument("--end-frame", type=int, default=10**9)
+    parser.add_argument("--ignore-codes", type=int, nargs="*", default=[114, 115, 116, 117])
+    parser.add_argument("--scales", type=float, nargs="*", default=[0.75, 0.5])
+    args = parser.parse_args()
+
+    frames = get_video(args.video, 0, args.end_frame, 1)
+    ignore_codes = tuple(args.ignore_codes)
+    processor = Processor()
+
+    reference, reference_ms = run_mode(frames, processor, ignore_codes, tracking=False)
+    modes = [("full frame", reference, reference_ms)]
+    modes.append(("tracking", *run_mode(frames, processor, ignore_codes, tracking=True)))
+    for scale in args.scales:
+        processor.set_coarse_detection(scale)
+        modes.append((f"coarse-to-fine x{scale}",
+                      *run_mode(frames, processor, ignore_codes, tracking=False)))
+    processor.set_coarse_detection(None)
+
+    print(f"{'mode':>22} {'ms/frame':>9} {'speedup':>8} {'recall':>7} "
+          f"{'max px err':>10} {'max deg err':>11}")
+    for name, raw_kinematics, ms_per_frame in modes:
+        recall, position_error, angle_error = accuracy(reference, raw_kinematics)
+        print(f"{name:>22} {ms_per_frame:>9.2f} {reference_ms / ms_per_frame:>8.2f} "
+              f"{recall:>7.3f} {position_error:>10.2f} {angle_error:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark of the frame-level metrics of *ampy.statistics2d*: the whole-array kernels against
+the per-frame and per-bot loops they replaced, and the chi_4 sweep against repeated chi_4 calls
+
+Usage: python benchmarks/bench_statistics2d.py [--frames 10000] [--bots 100] [--tau 60] [--a 5]
+                                               [--sweep-size 20]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ampy.kinematics import KinematicsArray
+import ampy.statistics2d as tds
+
+
+def random_walk_kinematics(frames_number: int, bots_number: int) -> KinematicsArray:
+    """
+    Returns kinematics of bots making small random steps, extended by polar coordinates
+    """
+    rng = np.random.default_rng(0)
+    positions = 500 + np.cumsum(rng.integers(-2, 3, (frames_number, bots_number, 2)), axis=0)
+    angles = rng.uniform(0, 360, (frames_number, bots_number))
+    kinematics = KinematicsArray(np.arange(bots_number), angles, positions.astype(float))
+    shifted = kinematics.positions - 500
+    return kinematics.with_polar(tds.RAD2DEG * np.arctan2(shifted[..., 1], shifted[..., 0]) % 360,
+                                 np.hypot(shifted[..., 0], shifted[..., 1]))
+
+
+def loop_mean_cartesian_displacements(positions: np.ndarray) -> list:
+    """
+    Reference per-frame and per-bot loop
+    """
+    mcd = []
+    for i_frame in range(len(positions)):
+        total = 0
+        for i_bot in range(positions.shape[1]):
+            total += tds.calc_distance(positions[i_frame][i_bot], positions[0][i_bot])
+        mcd.append(total / positions.shape[1])
+    return mcd
+
+
+def loop_chi_4(positions: np.ndarray, tau: int, a: float) -> float:
+    """
+    Reference per-frame and per-bot loop
+    """
+    q_sequence = []
+    N = positions.shape[1]
+    for i_frame in range(len(positions) - tau):
+        q = 0
+        for i_bot in range(N):
+            q += int(a - tds.calc_distance(positions[i_frame + tau][i_bot],
+                                           positions[i_frame][i_bot]) >= 0)
+        q_sequence.append(q / N)
+    return N * np.std(q_sequence)
+
+
+def loop_mean_polar_angle(polar_angles: np.ndarray) -> np.ndarray:
+    """
+    Reference per-bot unwrapping
+    """
+    return np.array([np.unwrap(polar_angle, period=360) for polar_angle in polar_angles.T]).mean(axis=0)
+
+
+def timed(function, *args) -> tuple:
+    """
+    Returns the function result and its running time in seconds
+    """
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--bots", type=int, default=100)
+    parser.add_argument("--tau", type=int, default=60)
+    parser.add_argument("--a", type=float, default=5)
+    parser.add_argument("--sweep-size", type=int, default=20)
+    args = parser.parse_args()
+
+    kinematics = random_walk_kinematics(args.frames, args.bots)
+    metrics = [
+        ("mean_cartesian_displacements",
+         (loop_mean_cartesian_displacements, kinematics.positions),
+         (tds.mean_cartesian_displacements, kinematics)),
+        ("chi_4",
+         (loop_chi_4, kinematics.positions, args.tau, args.a),
+         (tds.chi_4, kinematics, args.tau, args.a)),
+        ("mean_polar_angle",
+         (loop_mean_polar_angle, kinematics.polar_angles),
+         (tds.mean_polar_angle, kinematics)),
+    ]
+
+    print(f"{args.frames} frames x {args.bots} bots")
+    print(f"{'metric':>30} {'loop s':>8} {'array s':>8} {'speedup':>8} {'max diff':>9}")
+    for name, (loop_function, *loop_args), (array_function, *array_args) in metrics:
+        loop_result, loop_time = timed(loop_function, *loop_args)
+        array_result, array_time = timed(array_function, *array_args)
+        difference = np.max(np.abs(np.subtract(loop_result, array_result)))
+        print(f"{name:>30} {loop_time:>8.3f} {array_time:>8.4f} {loop_time / array_time:>8.0f} "
+              f"{difference:>9.1e}")
+
+    taus = np.unique(np.geomspace(1, args.frames // 2, args.sweep_size).astype(int))
+    thresholds = np.linspace(1, 50, args.sweep_size)
+    print(f"\nchi_4 over {len(taus)} taus x {len(thresholds)} distances")
+    repeated, repeated_time = timed(lambda: [[tds.chi_4(kinematics, tau, a) for a in thresholds]
+                                             for tau in taus])
+    print(f"{'repeated chi_4':>30} {repeated_time:>8.3f} s")
+    for n_jobs in (1, -1):
+        sweep, sweep_time = timed(tds.chi_4_sweep, kinematics, taus, thresholds, n_jobs)
+        print(f"{'chi_4_sweep n_jobs=' + str(n_jobs):>30} {sweep_time:>8.3f} s, speedup "
+              f"{repeated_time / sweep_time:.0f}, equal {np.array_equal(repeated, sweep)}")
+
+
+if __name__ == "__main__":
+    main()
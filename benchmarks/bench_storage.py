@@ -0,0 +1,87 @@
+"""
+Benchmark of the kinematics storage formats: size on disk and full read throughput of
+the pickled list (*Processor.load_p*), the memory-mapped file and the compressed archive
+of *ampy.storage*
+
+Usage: python benchmarks/bench_storage.py [--frames 10000] [--bots 100] [--chunk-size 1024]
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+
+from ampy.kinematics import KinematicsArray
+from ampy.processing import Processor
+from ampy.storage import load_archive, load_kinematics, save_archive, save_kinematics
+
+
+def random_walk_kinematics(frames_number: int, bots_number: int) -> KinematicsArray:
+    """
+    Returns kinematics of bots making small random steps: whole pixel positions and
+    slowly changing orientation angles as they come from the markers detection
+    """
+    rng = np.random.default_rng(0)
+    positions = 500 + np.cumsum(rng.integers(-2, 3, (frames_number, bots_number, 2)), axis=0)
+    angles = (rng.uniform(0, 360, bots_number)
+              + np.cumsum(rng.normal(0, 2, (frames_number, bots_number)), axis=0)) % 360
+    return KinematicsArray(np.arange(bots_number), angles, positions.astype(float))
+
+
+def measure(save, load, filename: str) -> tuple:
+    """
+    Returns file size in bytes, saving time and loading time in seconds
+    """
+    start_time = time.perf_counter()
+    save(filename)
+    save_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    load(filename)
+    load_time = time.perf_counter() - start_time
+    return os.path.getsize(filename), save_time, load_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--bots", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    kinematics = random_walk_kinematics(args.frames, args.bots)
+    kinematics_list = kinematics.to_list()
+
+    def save_pickle(filename):
+        with open(filename, 'wb') as file:
+            pickle.dump(kinematics_list, file)
+
+    def load_memory_mapped(filename):
+        # touch all the pages to compare the full read
+        loaded = load_kinematics(filename)
+        return loaded.positions.sum() + loaded.angles.sum()
+
+    with tempfile.TemporaryDirectory() as directory:
+        formats = [
+            ("pickle", *measure(save_pickle, Processor.load_p,
+                                os.path.join(directory, "kinematics.pickle"))),
+            ("memory-mapped", *measure(lambda filename: save_kinematics(filename, kinematics),
+                                       load_memory_mapped,
+                                       os.path.join(directory, "kinematics.ampy"))),
+            ("archive", *measure(lambda filename: save_archive(filename, kinematics,
+                                                               args.chunk_size),
+                                 load_archive, os.path.join(directory, "kinematics.arc"))),
+        ]
+
+    pickle_size = formats[0][1]
+    print(f"{args.frames} frames x {args.bots} bots")
+    print(f"{'format':>14} {'MB':>8} {'ratio':>7} {'save s':>7} {'load s':>7} {'frames/s':>10}")
+    for name, size, save_time, load_time in formats:
+        print(f"{name:>14} {size / 1e6:>8.2f} {pickle_size / size:>7.1f} {save_time:>7.2f} "
+              f"{load_time:>7.3f} {args.frames / load_time:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Module provides tests for the *ampy.backend*
+"""
+
+import functools
+import os
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+from ampy import backend
+
+
+MAIN_SCRIPT = """
+from ampy.backend import Backend
+
+process_backend = Backend("process", n_jobs=2)
+
+def f(item):
+    return item
+
+print(process_backend.map(f, range(4)))
+
+def f(item):
+    return -item
+
+def g(item):
+    return 2 * item
+
+print(process_backend.map(f, range(4)))
+print(process_backend.map(g, range(4)))
+print(process_backend.map(lambda item: item + 1, range(4)))
+"""
+
+
+class ExitingTask:
+    """
+    Task killing the worker process when unpickled
+    """
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+def scaled_rows(arrays: dict, output: np.ndarray, task: tuple) -> None:
+    """
+    Writes the rows of the task range scaled by the factor to the output
+    """
+    start, stop = task
+    output[start:stop] = arrays["rows"][start:stop] * arrays["factor"]
+
+
+class TestBackend(unittest.TestCase):
+    """
+    *TestBackend* class provides tests for the execution backend
+    """
+
+    def test_modes(self):
+        """
+        Test all the modes give the results in the items order
+        """
+
+        # assign
+
+        items = list(range(-50, 50))
+        truth = [abs(item) for item in items]
+
+        # assert
+
+        for mode in ("serial", "thread", "process"):
+            self.assertEqual(backend.Backend(mode, n_jobs=2).map(abs, items), truth)
+        self.assertEqual(backend.Backend("process", n_jobs=2, chunksize=7).map(abs, items), truth)
+        self.assertEqual(backend.Backend("thread", n_jobs=2).map(abs, []), [])
+
+    def test_map_shared(self):
+        """
+        Test all the modes fill the output array from the task ranges
+        """
+
+        # assign
+
+        rows = np.arange(300, dtype=float).reshape(30, 10)
+        factor = np.array(2.5)
+
+        # assert
+
+        for mode in ("serial", "thread", "process"):
+            execution_backend = backend.Backend(mode, n_jobs=2, chunksize=4)
+            output = execution_backend.map_shared(scaled_rows, {"rows": rows, "factor": factor},
+                                                  execution_backend.ranges(30), (30, 10))
+            self.assertTrue(np.array_equal(output, rows * factor))
+        self.assertEqual(backend.Backend("serial", chunksize=4).ranges(10), [(0, 4), (4, 8), (8, 10)])
+
+    def test_persistent_pool(self):
+        """
+        Test pools are reused between calls and created again after shutdown
+        """
+
+        # assign
+
+        pool = backend._pool("thread", 2)
+
+        # assert
+
+        self.assertIs(backend._pool("thread", 2), pool)
+        backend.shutdown()
+        self.assertIsNot(backend._pool("thread", 2), pool)
+
+    def test_main_functions(self):
+        """
+        Test functions defined or redefined in *__main__* after the pool creation are mapped
+        with their current definitions and lambdas are mapped serially
+        """
+
+        # assign
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", MAIN_SCRIPT],
+                                cwd=root,
+                                capture_output=True,
+                                text=True,
+                                timeout=120,
+                                check=True).stdout
+
+        # assert
+
+        self.assertEqual(output.split("\n")[:4], ["[0, 1, 2, 3]", "[0, -1, -2, -3]",
+                                                   "[0, 2, 4, 6]", "[1, 2, 3, 4]"])
+
+    def test_worker_death(self):
+        """
+        Test death of a worker raises an error instead of waiting forever and the broken pool
+        is replaced
+        """
+
+        # assign
+
+        process_backend = backend.Backend("process", n_jobs=2)
+        pool = backend._pool("process", 2)
+
+        # assert
+
+        with self.assertRaises(ChildProcessError):
+            process_backend.map(abs, [ExitingTask()])
+        self.assertIsNot(backend._pool("process", 2), pool)
+        self.assertEqual(process_backend.map(abs, [-1, -2]), [1, 2])
+
+    def test_origin(self):
+        """
+        Test functions and tasks are told apart by where the workers can import them from
+        """
+
+        # assign
+
+        def nested(item):
+            return item
+
+        # assert
+
+        self.assertEqual(backend._origin((abs, [(0, 1, scaled_rows)])), "module")
+        self.assertEqual(backend._origin((abs, [(0, 1, nested)])), "local")
+        self.assertEqual(backend._origin(lambda item: item), "local")
+        self.assertEqual(backend._origin(functools.partial(scaled_rows, factor=nested)), "local")
+        nested.__module__, nested.__qualname__ = "__main__", "nested"
+        self.assertEqual(backend._origin([np.zeros(2), {"f": nested}]), "main")
+
+    def test_auto_mode(self):
+        """
+        Test auto mode runs small work serially
+        """
+
+        # assign
+
+        auto_backend = backend.Backend("auto", n_jobs=4)
+
+        # assert
+
+        self.assertEqual(auto_backend.resolve_mode(100, 10), "serial")
+        self.assertEqual(auto_backend.resolve_mode(1, 10**9), "serial")
+        self.assertEqual(auto_backend.resolve_mode(200, 65**2), "process")
+        self.assertEqual(backend.Backend("auto", n_jobs=1).resolve_mode(200, 65**2), "serial")
+        with self.assertRaises(ValueError):
+            backend.Backend("cluster")
+
+    def test_default_backend(self):
+        """
+        Test default backend is replaced by *set_backend*
+        """
+
+        # assign
+
+        default_backend = backend.get_backend()
+        serial_backend = backend.set_backend("serial")
+
+        # assert
+
+        self.assertIs(backend.get_backend(), serial_backend)
+        self.assertEqual(serial_backend.mode, "serial")
+        backend.set_backend(default_backend.mode, default_backend.n_jobs, default_backend.chunksize)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Module provides tests for the *ampy.batch*
+"""
+
+import os
+import tempfile
+
+import unittest
+
+from ampy.batch import format_summary, process_many
+from ampy.processing import Processor
+
+
+class TestBatch(unittest.TestCase):
+    """
+    *TestBatch* class provides tests for the *batch.process_many* method
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize objects for testing
+        """
+
+        self.filename = os.path.dirname(__file__) + "/" + 'test_processing_files/test_video.mp4'
+
+    def test_process_many(self):
+        """
+        Test processing of several videos with failures in some of them
+        """
+
+        # assign
+
+        processor = Processor()
+        processor.set_filename(self.filename)
+        result = processor.cartesian_kinematics(2, 1, 12, 3, (114, 115, 116, 117), (1, 0))
+        jobs = [
+            {"filename": self.filename, "bots_number": 2, "end_frame": 12, "get_each": 3,
+             "ignore_codes": (114, 115, 116, 117), "n_jobs": 2},
+            {"filename": self.filename, "bots_number": 3, "end_frame": 6,
+             "ignore_codes": (114, 115, 116, 117), "output": "too_many_bots.pickle"},
+            {"filename": "missing_video.mp4", "bots_number": 2},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            rows = process_many(jobs, directory, n_jobs=2)
+            saved_result = Processor.load_p(os.path.join(directory, "test_video.pickle"))
+            saved_files = sorted(os.listdir(directory))
+
+        # assert
+
+        self.assertEqual([row["status"] for row in rows], ["ok", "failed", "failed"])
+        self.assertEqual(saved_result, result)
+        self.assertEqual(saved_files, ["test_video.pickle"])
+        self.assertEqual([row["frames"] for row in rows], [4, 6, 0])
+        self.assertGreater(rows[0]["fps"], 0)
+        self.assertIn("ValueError", rows[1]["error"])
+        self.assertIn("FileNotFoundError", rows[2]["error"])
+        self.assertEqual(len(format_summary(rows).splitlines()), 4)
+
+    def test_duplicate_outputs(self):
+        """
+        Test jobs saved to the same file are rejected
+        """
+
+        # assert
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                process_many([{"filename": self.filename, "bots_number": 2},
+                              {"filename": self.filename, "bots_number": 2}], directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Module provides tests for the *ampy.cache*
+"""
+
+import os
+import tempfile
+import time
+
+import unittest
+
+import numpy as np
+
+from ampy.cache import DetectionCache, pack_detections, unpack_detections, video_fingerprint
+
+
+class TestCache(unittest.TestCase):
+    """
+    *TestCache* class provides tests for the *cache.DetectionCache* class
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize objects for testing
+        """
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.dirname(__file__) + "/" + 'test_processing_files/test_video.mp4'
+        self.detections = {
+            1: pack_detections([np.arange(8, dtype=np.float32).reshape((1, 4, 2))],
+                               np.array([[7]])),
+            2: pack_detections([], None),
+        }
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary files
+        """
+
+        self.directory.cleanup()
+
+    def test_save_load(self):
+        """
+        Test saved detections are loaded back
+        """
+
+        # assign
+
+        cache = DetectionCache(self.directory.name)
+        key = cache.key(self.filename, {"dictionary": "DICT_7X7_1000"})
+        cache.save(key, self.detections)
+        cache.save(key, {3: self.detections[1]})
+        loaded = cache.load(key)
+
+        # assert
+
+        self.assertEqual(sorted(loaded), [1, 2, 3])
+        corners, ids = unpack_detections(loaded[1])
+        self.assertEqual(ids.tolist(), [[7]])
+        self.assertTrue(np.array_equal(corners[0], self.detections[1][0][:1]))
+        self.assertEqual(len(unpack_detections(loaded[2])[0]), 0)
+        self.assertNotEqual(key, cache.key(self.filename, {"dictionary": "DICT_4X4_50"}))
+        self.assertEqual(video_fingerprint(self.filename), video_fingerprint(self.filename))
+
+    def test_eviction(self):
+        """
+        Test the least recently used entries are evicted
+        """
+
+        # assign
+
+        cache = DetectionCache(self.directory.name, max_size=1)
+        cache.save("first", self.detections)
+        time.sleep(0.01)
+        cache.save("second", self.detections)
+
+        # assert
+
+        self.assertEqual(cache.load("first"), {})
+        self.assertEqual(sorted(cache.load("second")), [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Module provides tests for the *ampy.kinematics*
+"""
+
+import os
+
+import unittest
+
+import numpy as np
+
+from ampy.kinematics import KinematicsArray, as_kinematics_array, as_kinematics_list
+
+
+class TestKinematics(unittest.TestCase):
+    """
+    *TestKinematics* class provides tests for the *kinematics.KinematicsArray* class
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize objects for testing
+        """
+
+        self.kinematics = \
+            np.load(os.path.dirname(__file__) + "/" + "test_statistics2d_files/test_kinematics.npy",
+                    allow_pickle=True).tolist()
+
+    def test_from_list(self):
+        """
+        Test conversion from the list format
+        """
+
+        # assign
+
+        kinematics_array = KinematicsArray.from_list(self.kinematics)
+
+        # assert
+
+        self.assertEqual(kinematics_array.frames_number, 200)
+        self.assertEqual(kinematics_array.bots_number, 65)
+        self.assertEqual(kinematics_array.positions.shape, (200, 65, 2))
+        self.assertFalse(kinematics_array.has_polar)
+        self.assertEqual(kinematics_array.angles[3, 5], self.kinematics[3][5][1])
+        self.assertEqual(tuple(kinematics_array.positions[3, 5]), self.kinematics[3][5][2])
+
+    def test_to_list(self):
+        """
+        Test conversion to the list format
+        """
+
+        # assert
+
+        self.assertEqual(as_kinematics_array(self.kinematics).to_list(), self.kinematics)
+        self.assertIs(as_kinematics_list(self.kinematics), self.kinematics)
+
+        polar_kinematics = [[[bot[0], bot[1], bot[2], 10.0, 20.0] for bot in frame]
+                            for frame in self.kinematics]
+        polar_kinematics_array = as_kinematics_array(polar_kinematics)
+        self.assertTrue(polar_kinematics_array.has_polar)
+        self.assertEqual(polar_kinematics_array.to_list(), polar_kinematics)
+
+    def test_views(self):
+        """
+        Test frames and bots views share memory with the original arrays
+        """
+
+        # assign
+
+        kinematics_array = as_kinematics_array(self.kinematics)
+        frames = kinematics_array.frames(10, 20)
+        bot = kinematics_array.bot(self.kinematics[0][7][0])
+
+        # assert
+
+        self.assertEqual(len(frames), 10)
+        self.assertTrue(np.shares_memory(frames.positions, kinematics_array.positions))
+        self.assertEqual(bot.bots_number, 1)
+        self.assertTrue(np.shares_memory(bot.angles, kinematics_array.angles))
+        self.assertTrue(np.array_equal(bot.positions[:, 0], kinematics_array.positions[:, 7]))
+        self.assertTrue(np.array_equal(kinematics_array.frame(-1).angles[0],
+                                       kinematics_array.angles[-1]))
+
+    def test_columns(self):
+        """
+        Test kinematics is restored from its columns
+        """
+
+        # assign
+
+        kinematics_array = as_kinematics_array(self.kinematics)
+        polar_kinematics = kinematics_array.with_polar(kinematics_array.angles,
+                                                       kinematics_array.angles)
+
+        # assert
+
+        self.assertEqual(set(kinematics_array.columns()), {"ids", "angles", "positions"})
+        self.assertEqual(KinematicsArray(**kinematics_array.columns()).to_list(),
+                         kinematics_array.to_list())
+        self.assertEqual(KinematicsArray(**polar_kinematics.columns()).to_list(),
+                         polar_kinematics.to_list())
+
+    def test_inconsistent_frames(self):
+        """
+        Test conversion of frames with different bots fails
+        """
+
+        # assign
+
+        kinematics = [self.kinematics[0], self.kinematics[1][1:]]
+
+        # assert
+
+        with self.assertRaises(ValueError):
+            as_kinematics_array(kinematics)
+
+
+if __name__ == '__main__':
+    unittest.main()
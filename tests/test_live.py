@@ -0,0 +1,91 @@
+"""
+Module provides tests for the *ampy.live*
+"""
+
+import os
+
+import unittest
+
+import cv2
+
+from ampy.live import LiveProcessor
+from ampy.processing import Processor
+
+
+class TestLive(unittest.TestCase):
+    """
+    *TestLive* class provides tests for the *live.LiveProcessor* class
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize objects for testing
+        """
+
+        self.filename = os.path.dirname(__file__) + "/" + 'test_processing_files/test_video.mp4'
+        self.processor = Processor()
+
+    def test_native_rate_replay(self):
+        """
+        Test processing of a video file replayed at its native frame rate
+        """
+
+        # assign
+
+        callback_frames = []
+        live_processor = LiveProcessor(self.processor, self.filename,
+                                       ignore_codes=(114, 115, 116, 117),
+                                       latency_budget=1.0, buffer_size=5, native_rate=True,
+                                       callback=lambda frame_number, kinematics:
+                                       callback_frames.append(frame_number))
+        statistics = live_processor.run(max_frames=10)
+        kinematics = live_processor.kinematics()
+
+        video_capture = cv2.VideoCapture(self.filename)
+        video_capture.set(cv2.CAP_PROP_POS_FRAMES, kinematics[-1][0] - 1)
+        _, frame = video_capture.read()
+        video_capture.release()
+
+        # assert
+
+        self.assertEqual(statistics["processed"], 10)
+        self.assertEqual(len(callback_frames), 10)
+        self.assertEqual(callback_frames, sorted(callback_frames))
+        self.assertGreaterEqual(statistics["captured"],
+                                statistics["processed"] + statistics["dropped"])
+        self.assertLessEqual(statistics["fps"], 31)
+        self.assertGreater(statistics["latency_mean"], 0)
+        self.assertGreaterEqual(statistics["latency_max"], statistics["latency_mean"])
+        self.assertEqual([frame_number for frame_number, _ in kinematics], callback_frames[-5:])
+        self.assertEqual(kinematics[-1][1],
+                         self.processor._raw_cartesian_kinematics_from_frame(
+                             frame, (114, 115, 116, 117)))
+
+    def test_latency_budget(self):
+        """
+        Test frames exceeding the latency budget are dropped
+        """
+
+        # assign
+
+        statistics = LiveProcessor(self.processor, self.filename, latency_budget=0.0).run()
+
+        # assert
+
+        self.assertEqual(statistics["processed"], 0)
+        self.assertEqual(statistics["captured"], 124)
+        self.assertEqual(statistics["dropped"], 124)
+
+    def test_unavailable_source(self):
+        """
+        Test opening of a missing source fails
+        """
+
+        # assert
+
+        with self.assertRaises(ValueError):
+            LiveProcessor(self.processor, "missing_video.mp4").run()
+
+
+if __name__ == '__main__':
+    unittest.main()
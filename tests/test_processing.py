@@ -3,13 +3,17 @@ Module provides tests for the *ampy.processing*
 """
 
 import os
+import pickle
+import tempfile
 import numpy as np
 
 import unittest
+from unittest import mock
 
 import cv2
 
-from ampy.processing import Processor
+from ampy.kinematics import KinematicsArray
+from ampy.processing import CalibrationSession, FramePreprocessor, Processor
 
 
 class TestProcessing(unittest.TestCase):
@@ -63,6 +67,288 @@ class TestProcessing(unittest.TestCase):
         result = self.vp.cartesian_kinematics(2, 1, 100, 1, (114, 115, 116, 117), (1, 0))
         self.assertTrue(_is_equal(result, truth))
 
+    def test_cartesian_kinematics_decode_modes(self):
+        """
+        Test *cartesian_kinematics* method gives the same result in both decoding modes
+        """
+
+        # assign
+
+        seek_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0),
+                                                   decode_mode="seek")
+        sequential_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0),
+                                                         decode_mode="sequential")
+
+        # assert
+
+        self.assertEqual(seek_result, sequential_result)
+
+    def test_cartesian_kinematics_n_jobs(self):
+        """
+        Test *cartesian_kinematics* method gives the same result in serial and sharded modes
+        """
+
+        # assign
+
+        serial_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+        sharded_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0),
+                                                      n_jobs=3)
+        worker_processor = pickle.loads(pickle.dumps(self.vp))
+
+        # assert
+
+        self.assertEqual(serial_result, sharded_result)
+        self.assertIsNotNone(self.vp._cartesian_kinematics)
+        self.assertIsNone(worker_processor._cartesian_kinematics)
+        self.assertIsNone(worker_processor._polar_kinematics)
+
+    def test_cartesian_kinematics_n_threads(self):
+        """
+        Test *cartesian_kinematics* method gives the same result in serial and pipelined modes
+        """
+
+        # assign
+
+        serial_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+        pipelined_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0),
+                                                        n_threads=3, queue_size=2)
+
+        # assert
+
+        self.assertEqual(serial_result, pipelined_result)
+
+    def test_cartesian_kinematics_tracking(self):
+        """
+        Test *cartesian_kinematics* method gives the same result with and without tracking
+        """
+
+        # assign
+
+        full_frame_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+        self.vp.set_tracking(window_scale=2.0, redetect_every=5)
+        tracking_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+
+        # assert
+
+        self.assertEqual(full_frame_result, tracking_result)
+        with self.assertRaises(ValueError):
+            self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0), n_threads=2)
+
+    def test_cartesian_kinematics_coarse_detection(self):
+        """
+        Test *cartesian_kinematics* method gives close results with coarse-to-fine detection
+        """
+
+        # assign
+
+        full_result = self.vp.cartesian_kinematics(2, 1, 1, 1, (114, 115, 116, 117), (1, 0))
+        self.vp.set_coarse_detection(0.75)
+        coarse_result = self.vp.cartesian_kinematics(2, 1, 1, 1, (114, 115, 116, 117), (1, 0))
+
+        # assert
+
+        self.assertEqual(len(full_result), len(coarse_result))
+        for full_bot, coarse_bot in zip(full_result[0], coarse_result[0]):
+            self.assertEqual(full_bot[0], coarse_bot[0])
+            self.assertLess(abs(full_bot[1] - coarse_bot[1]), 5)
+            self.assertLessEqual(abs(full_bot[2][0] - coarse_bot[2][0]), 2)
+            self.assertLessEqual(abs(full_bot[2][1] - coarse_bot[2][1]), 2)
+
+    def test_cartesian_kinematics_preprocessing(self):
+        """
+        Test *cartesian_kinematics* method gives the same result with all preprocessing modes
+        """
+
+        # assign
+
+        gray_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+        self.vp.set_preprocessing(grayscale=False)
+        color_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+        self.vp.set_preprocessing(crop=(450, 300, 1920, 1080))
+        cropped_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+
+        self.vp.set_preprocessing()
+        scaled_gray_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117),
+                                                          (1.5, -30))
+        self.vp.set_preprocessing(grayscale=False)
+        scaled_color_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117),
+                                                           (1.5, -30))
+        self.vp.set_preprocessing(crop=(450, 300, 1920, 1080))
+
+        image = np.random.default_rng(0).integers(0, 256, (40, 60), dtype=np.uint8)
+        color_image = np.random.default_rng(1).integers(0, 256, (40, 60, 3), dtype=np.uint8)
+        preprocessor = FramePreprocessor((0.7, 10))
+
+        # assert
+
+        self.assertEqual(gray_result, color_result)
+        self.assertEqual(gray_result, cropped_result)
+        self.assertEqual(scaled_gray_result, scaled_color_result)
+        self.assertTrue(np.array_equal(preprocessor(image),
+                                       cv2.convertScaleAbs(image, alpha=0.7, beta=10)))
+        self.assertTrue(np.array_equal(preprocessor(color_image),
+                                       cv2.cvtColor(cv2.convertScaleAbs(color_image, alpha=0.7,
+                                                                        beta=10),
+                                                    cv2.COLOR_BGR2GRAY)))
+        self.assertTrue(np.array_equal(FramePreprocessor((0.7, 10), scale_grayscale=True)(image),
+                                       preprocessor(image)))
+        self.assertEqual(self.vp.frame_preprocessor((1, 0)).offset.tolist(), [450, 300])
+
+    def test_iter_kinematics(self):
+        """
+        Test *iter_kinematics* method gives the same frames as *cartesian_kinematics*
+        """
+
+        # assign
+
+        result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+        frames = list(self.vp.iter_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0),
+                                              lookahead=10))
+
+        # assert
+
+        self.assertEqual(result, [kinematics_frame for _, kinematics_frame in frames])
+        self.assertTrue(all(frame_number in range(1, 31, 3) for frame_number, _ in frames))
+
+    def test_iter_kinematics_memory(self):
+        """
+        Test streamed detections are not kept without the cache and are saved to the cache
+        in chunks during the run
+        """
+
+        # assign
+
+        frames = self.vp._iter_raw_cartesian_kinematics(range(1, 41), (), (1, 0), "sequential")
+        kept_numbers = []
+        for _ in range(20):
+            next(frames)
+            kept_numbers.append(len(frames.gi_frame.f_locals["uncached_detections"]))
+        frames.close()
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.vp.set_cache(directory)
+            with mock.patch("ampy.processing.CACHE_CHUNK_FRAMES", 4):
+                frames = self.vp._iter_raw_cartesian_kinematics(range(1, 11), (), (1, 0),
+                                                                "sequential")
+                for _ in range(9):
+                    next(frames)
+                saved_chunks = [name for _, _, names in os.walk(directory) for name in names]
+                frames.close()
+
+        # assert
+
+        self.assertEqual(kept_numbers, [0] * 20)
+        self.assertEqual(len(saved_chunks), 2)
+
+    def test_fill_gaps_in_raw_kinematics(self):
+        """
+        Test gaps filling by the next recognized positions and by linear interpolation
+        """
+
+        # assign
+
+        raw_kinematics = [
+            [[1, 350.0, (0, 0)], [2, 90.0, (50, 50)]],
+            [[2, 90.0, (50, 50)]],
+            [[1, 10.0, (10, 20)], [2, 90.0, (50, 50)]],
+            [[2, 90.0, (50, 50)]],
+        ]
+
+        # assert
+
+        result = self.vp._fill_gaps_in_raw_kinematics(2, raw_kinematics)
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[1], [[1, 10.0, (10, 20)], [2, 90.0, (50, 50)]])
+
+        result = self.vp._fill_gaps_in_raw_kinematics(2, raw_kinematics, interpolate=True)
+        self.assertEqual(len(result), 3)
+        self.assertAlmostEqual(result[1][0][1] % 360, 0.0)
+        self.assertEqual(result[1][0][2], (5.0, 10.0))
+
+        with self.assertRaises(ValueError):
+            self.vp._fill_gaps_in_raw_kinematics(1, raw_kinematics)
+        with self.assertRaises(ValueError):
+            self.vp._fill_gaps_in_raw_kinematics(3, raw_kinematics)
+
+    def test_cartesian_kinematics_cache(self):
+        """
+        Test *cartesian_kinematics* method reuses cached detections
+        """
+
+        # assign
+
+        result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+        with tempfile.TemporaryDirectory() as directory:
+            self.vp.set_cache(directory)
+            first_result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+            with mock.patch.object(Processor, '_detect_markers', side_effect=AssertionError):
+                second_result = self.vp.cartesian_kinematics(1, 1, 30, 3,
+                                                             (24, 114, 115, 116, 117), (1, 0))
+
+        # assert
+
+        self.assertEqual(result, first_result)
+        self.assertTrue(all(len(frame) == 1 and frame[0][0] == 54 for frame in second_result))
+
+    def test_cartesian_kinematics_tracking_cache(self):
+        """
+        Test cached tracking detections are not reused with other ignored markers or bots number
+        """
+
+        # assign
+
+        frame_numbers = range(1, 41)
+        self.vp.set_tracking(window_scale=2.0, redetect_every=5)
+        fresh_result = self.vp._raw_cartesian_kinematics(frame_numbers, (), (1, 0), "sequential",
+                                                         bots_number=6, progress=False)
+        with tempfile.TemporaryDirectory() as directory:
+            self.vp.set_cache(directory)
+            self.vp._raw_cartesian_kinematics(frame_numbers, (114, 115, 116, 117), (1, 0),
+                                              "sequential", bots_number=2, progress=False)
+            cached_result = self.vp._raw_cartesian_kinematics(frame_numbers, (), (1, 0),
+                                                              "sequential", bots_number=6,
+                                                              progress=False)
+
+        # assert
+
+        self.assertEqual(fresh_result, cached_result)
+
+    def test_cartesian_kinematics_resume(self):
+        """
+        Test *cartesian_kinematics* method resumes an interrupted run from its checkpoint
+        """
+
+        # assign
+
+        result = self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0))
+        detect_markers = self.vp._detect_markers
+        calls = []
+
+        def interrupted_detect_markers(frame, coarse=True):
+            calls.append(frame)
+            if len(calls) > 5:
+                raise KeyboardInterrupt
+            return detect_markers(frame, coarse)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.object(self.vp, '_detect_markers', interrupted_detect_markers):
+                with self.assertRaises(KeyboardInterrupt):
+                    self.vp.cartesian_kinematics(2, 1, 30, 3, (114, 115, 116, 117), (1, 0),
+                                                 checkpoint_directory=directory,
+                                                 checkpoint_every=2)
+            calls.clear()
+            with mock.patch.object(self.vp, '_detect_markers', side_effect=detect_markers) \
+                    as resumed_detect_markers:
+                resumed_result = self.vp.cartesian_kinematics(2, 1, 30, 3,
+                                                              (114, 115, 116, 117), (1, 0),
+                                                              checkpoint_directory=directory,
+                                                              resume=True)
+
+        # assert
+
+        self.assertEqual(result, resumed_result)
+        self.assertEqual(resumed_detect_markers.call_count, 5)
+
     def test_field_center_auto(self):
         """
         Test *field_center_auto* method
@@ -140,6 +426,19 @@ class TestProcessing(unittest.TestCase):
         result = self.vp.polar_kinematics(cart_kin, center)
         self.assertTrue(_is_equal(result, truth))
 
+        result = self.vp.polar_kinematics(KinematicsArray.from_list(cart_kin), center)
+        self.assertIsInstance(result, KinematicsArray)
+        self.assertTrue(_is_equal(result.to_list(), truth))
+
+        cart_kin_array = KinematicsArray.from_list(cart_kin)
+        result = self.vp.polar_kinematics(cart_kin_array, center, inplace=True)
+        self.assertIs(result, cart_kin_array)
+        self.assertTrue(_is_equal(result.to_list(), truth))
+
+        result = self.vp.polar_kinematics(cart_kin, center, inplace=True)
+        self.assertIs(result, cart_kin)
+        self.assertTrue(_is_equal(cart_kin, truth))
+
     def test_metric_constant(self):
         """
         Test *metric_constant* method
@@ -156,6 +455,90 @@ class TestProcessing(unittest.TestCase):
         result = self.vp.metric_constant(3, (1, 0))
         self.assertAlmostEqual(result, truth)
 
+    def test_calibration_session(self):
+        """
+        Test calibration methods share decoded frames and give robust estimates
+        """
+
+        # assign
+
+        truth = np.load(os.path.dirname(__file__) + "/"
+                        + "test_processing_files/field_center_auto_truth.npy",
+                        allow_pickle=True).tolist()
+        with mock.patch.object(self.vp, '_detect_markers', wraps=self.vp._detect_markers) \
+                as detect_markers:
+            center = self.vp.field_center_auto((114, 116), (115, 117), (1, 0))
+            metric_constant = self.vp.metric_constant(3, (1, 0))
+            first_frame = self.vp.calibration_session((1, 0)).first_frame
+        session = self.vp.calibration_session((1, 0), frames_number=10)
+        robust_center = session.field_center_auto((114, 116), (115, 117))
+        robust_metric_constant = session.metric_constant(3, marker_ids=(24, 54))
+
+        # assert
+
+        self.assertEqual(detect_markers.call_count, 1)
+        self.assertEqual(first_frame.shape, (1080, 1920, 3))
+        self.assertEqual(len(list(session.detections())), 10)
+        for value, robust_value, truth_value in zip(center, robust_center, truth):
+            self.assertLess(abs(robust_value - truth_value), 0.1)
+            self.assertLess(abs(value - truth_value), 0.1)
+        self.assertLess(abs(robust_metric_constant / metric_constant - 1), 0.03)
+
+    def test_calibration_session_release(self):
+        """
+        Test calibration methods release the video and the following calls continue decoding
+        from the next frame
+        """
+
+        # assign
+
+        self.vp.field_center_auto((114, 116), (115, 117), (1, 0), robust=False)
+        released = self.vp.calibration_session((1, 0))._video_capture is None
+        session = self.vp.calibration_session((1, 0), frames_number=12)
+        session.field_center_auto((114, 116), (115, 117), robust=False)
+        decoded_number = len(session._detections)
+        session.metric_constant(3)
+        continuous_session = CalibrationSession(self.vp, (1, 0), frames_number=12)
+
+        # assert
+
+        self.assertTrue(released)
+        self.assertIsNone(session._video_capture)
+        self.assertLess(decoded_number, 12)
+        self.assertEqual(len(session._detections), 12)
+        for (corners, ids), (continuous_corners, continuous_ids) \
+                in zip(session.detections(), continuous_session.detections()):
+            self.assertTrue(np.array_equal(ids, continuous_ids))
+            self.assertTrue(np.array_equal(np.array(corners), np.array(continuous_corners)))
+
+    def test_autotune_detector(self):
+        """
+        Test *autotune_detector* method and saving of the found parameters
+        """
+
+        # assign
+
+        search_space = [[{"adaptiveThreshWinSizeMin": 3, "adaptiveThreshWinSizeMax": 23},
+                         {"adaptiveThreshWinSizeMin": 7, "adaptiveThreshWinSizeMax": 7}]]
+        best, report = self.vp.autotune_detector(2, (114, 115, 116, 117), (1, 0),
+                                                 samples_number=5, target_recall=1.0,
+                                                 search_space=search_space)
+        processor = Processor()
+        with tempfile.TemporaryDirectory() as directory:
+            self.vp.save_detector_parameters(directory + "/detector.json")
+            processor.load_detector_parameters(directory + "/detector.json")
+
+        # assert
+
+        self.assertEqual(len(report), 2)
+        self.assertTrue(all(0 <= row["recall"] <= 1 and row["ms_per_frame"] > 0
+                            for row in report))
+        self.assertIn(best, [row["parameters"] for row in report])
+        self.assertEqual(max(row["recall"] for row in report),
+                         [row["recall"] for row in report if row["parameters"] == best][0])
+        self.assertEqual(processor._aruco_parameters.adaptiveThreshWinSizeMax,
+                         best["adaptiveThreshWinSizeMax"])
+
     def test_load_p(self):
         """
         Test *load_p* method
@@ -2,12 +2,14 @@
 Module provides tests for the *ampy.statistics2d*
 """
 
+import functools
 import os 
 
 import unittest
 
 import numpy as np
 
+from ampy.kinematics import KinematicsArray
 from ampy.processing import Processor
 import ampy.statistics2d as tds
 
@@ -161,6 +163,34 @@ class TestStatistics2D(unittest.TestCase):
 
         self.assertTrue(is_equal(tds.bond_orientation(self.kinematics, 6, 6, 1), truth))
 
+    def test_nearest_neighbours(self):
+        """
+        Test the grid neighbours search gives the same neighbours as the brute force one
+        """
+
+        #assign
+        positions = np.random.default_rng(0).integers(0, 100, (1000, 2)).astype(float)
+        positions[-2:] = [[1e4, 1e4], [-1e4, 0]]
+        distances = tds._distances(positions[:, None], positions[None])
+
+        #assert
+        for neighbours_number in (1, 6, 30):
+            self.assertTrue(np.array_equal(tds._nearest_neighbours(positions, neighbours_number),
+                                           np.argsort(distances, axis=1, kind="stable")
+                                           [:, :neighbours_number]))
+
+    def test_bond_orientation_local(self):
+        """
+        Test *amtoolkit.statistics2d.bond_orientation* function local values
+        """
+
+        #assign
+        boo, local_boo = tds.bond_orientation(self.kinematics, 6, 6, 10, return_local=True)
+
+        #assert
+        self.assertEqual(local_boo.shape, (20, 65))
+        self.assertTrue(np.allclose(local_boo.mean(axis=1), boo))
+
     def test_chi_4(self):
         """
         Test *amtoolkit.statistics2d.chi_4* function
@@ -173,6 +203,20 @@ class TestStatistics2D(unittest.TestCase):
         #assert
         self.assertAlmostEqual(tds.chi_4(self.kinematics, 60, 100), truth)
 
+    def test_chi_4_sweep(self):
+        """
+        Test *amtoolkit.statistics2d.chi_4_sweep* function
+        """
+
+        #assign
+        taus, a = [1, 60, 150], [100, 5, 30]
+        truth = [[tds.chi_4(self.kinematics, tau, a_value) for a_value in a] for tau in taus]
+
+        #assert
+        self.assertTrue(np.array_equal(tds.chi_4_sweep(self.kinematics, taus, a, n_jobs=1), truth))
+        self.assertTrue(np.array_equal(tds.chi_4_sweep(self.kinematics, taus, a, n_jobs=2,
+                                                       memory_budget=10000), truth))
+
     def test_cluster_dynamics(self):
         """
         Test *amtoolkit.statistics2d.cluster_dynamics* function
@@ -197,6 +241,72 @@ class TestStatistics2D(unittest.TestCase):
 
         self.assertTrue(is_equal(tds.cluster_dynamics(self.kinematics), truth))
 
+    def test_cluster_dynamics_radius(self):
+        """
+        Test *amtoolkit.statistics2d.cluster_dynamics* grid contacts give the same coefficients
+        as the pairwise collision calls
+        """
+
+        #assign
+        collide_function = functools.partial(tds._is_collide, d=100)
+        truth = [tds._clustering_coefficient_frame((frame, collide_function))
+                 for frame in self.kinematics[:20]]
+
+        #assert
+        self.assertEqual(tds._collision_radius(collide_function), 100)
+        self.assertIsNone(tds._collision_radius(lambda bot_1, bot_2: True))
+        self.assertEqual(tds.cluster_dynamics(self.kinematics[:20], collide_function), truth)
+
+    def test_compute_all(self):
+        """
+        Test *amtoolkit.statistics2d.compute_all* function gives the results of the functions
+        """
+
+        #assign
+        metrics = {"mean_distance_from_center": {}, "mean_polar_angle_absolute": {},
+                   "mean_cartesian_displacements": {},
+                   "bond_orientation": {"neighbours_number": 6, "folds_number": 6, "get_each": 3,
+                                        "return_local": True},
+                   "chi_4": {"tau": 60, "a": 100},
+                   "cluster_dynamics": {"collide_function": functools.partial(tds._is_collide,
+                                                                              d=100)}}
+        results = tds.compute_all(self.extended_kinematics, metrics)
+
+        #assert
+        self.assertEqual(list(results), list(metrics))
+        for name, parameters in metrics.items():
+            truth = getattr(tds, name)(self.extended_kinematics, **parameters)
+            if name == "bond_orientation":
+                self.assertEqual(results[name][0], truth[0])
+                self.assertTrue(np.array_equal(results[name][1], truth[1]))
+            else:
+                self.assertTrue(np.array_equal(results[name], truth))
+        self.assertEqual(list(tds.compute_all(self.kinematics, ["mean_cartesian_displacements"])),
+                         ["mean_cartesian_displacements"])
+        with self.assertRaises(ValueError):
+            tds.compute_all(self.kinematics, ["unknown_metric"])
+
+    def test_kinematics_array_input(self):
+        """
+        Test functions give the same results for list and *KinematicsArray* kinematics
+        """
+
+        # assign
+        kinematics_array = KinematicsArray.from_list(self.kinematics)
+        extended_kinematics_array = self.vp.polar_kinematics(kinematics_array, (0, 0))
+
+        #assert
+        self.assertTrue(np.allclose(tds.mean_cartesian_displacements(kinematics_array),
+                                    tds.mean_cartesian_displacements(self.kinematics)))
+        self.assertTrue(np.allclose(tds.bond_orientation(kinematics_array, 6, 6, 10),
+                                    tds.bond_orientation(self.kinematics, 6, 6, 10)))
+        self.assertAlmostEqual(tds.chi_4(kinematics_array, 60, 100),
+                               tds.chi_4(self.kinematics, 60, 100))
+        self.assertTrue(np.allclose(tds.mean_distance_from_center(extended_kinematics_array),
+                                    tds.mean_distance_from_center(self.extended_kinematics)))
+        self.assertTrue(np.allclose(tds.mean_polar_angle(extended_kinematics_array),
+                                    tds.mean_polar_angle(self.extended_kinematics)))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -8,6 +8,7 @@ import unittest
 
 import numpy as np
 
+from ampy.backend import Backend
 from ampy.processing import Processor
 import ampy.statistics3d as tds
 
@@ -116,6 +117,22 @@ class TestStatistics3D(unittest.TestCase):
 
         self.assertTrue(is_equal(tds.velocity_correlation(self.kinematics, 200, 200), truth))
 
+    def test_backends(self):
+        """
+        Test the process backend with shared memory gives the same matrices as the serial one
+        """
+
+        # assign
+        kinematics = self.kinematics[:10]
+        process_backend = Backend("process", n_jobs=2)
+        serial_backend = Backend("serial")
+
+        # assert
+        for function in (tds.position_correlation, tds.orientation_correlation,
+                         tds.velocity_correlation):
+            self.assertEqual(function(kinematics, 60, 40, process_backend),
+                             function(kinematics, 60, 40, serial_backend))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,170 @@
+"""
+Module provides tests for the *ampy.storage*
+"""
+
+import os
+import tempfile
+
+import unittest
+
+import numpy as np
+
+from ampy.kinematics import as_kinematics_array
+from ampy.storage import ArchiveReader, load_archive, load_kinematics, read_header, \
+    save_archive, save_kinematics
+
+
+class TestStorage(unittest.TestCase):
+    """
+    *TestStorage* class provides tests for the kinematics files
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize objects for testing
+        """
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "kinematics.ampy")
+        self.kinematics = \
+            np.load(os.path.dirname(__file__) + "/" + "test_statistics2d_files/test_kinematics.npy",
+                    allow_pickle=True).tolist()
+
+    def tearDown(self) -> None:
+        """
+        Remove temporary files
+        """
+
+        self.directory.cleanup()
+
+    def test_save_load(self):
+        """
+        Test kinematics are loaded as saved with lazy frames and bots views
+        """
+
+        # assign
+
+        save_kinematics(self.filename, self.kinematics)
+        kinematics_array = load_kinematics(self.filename)
+        frames = kinematics_array.frames(50, 60)
+        bot = kinematics_array.bot(self.kinematics[0][3][0])
+
+        # assert
+
+        self.assertEqual(kinematics_array.to_list(), self.kinematics)
+        self.assertIsInstance(kinematics_array.positions.base, np.memmap)
+        self.assertEqual(frames.to_list(), self.kinematics[50:60])
+        self.assertTrue(np.array_equal(bot.positions[:, 0],
+                                       [frame[3][2] for frame in self.kinematics]))
+        self.assertEqual(load_kinematics(self.filename, mmap_mode=None).to_list(),
+                         self.kinematics)
+
+    def test_bot_blocks(self):
+        """
+        Test a bot view of the loaded kinematics touches only the bot's blocks of the file
+        """
+
+        # assign
+
+        save_kinematics(self.filename, self.kinematics)
+        kinematics_array = load_kinematics(self.filename)
+        bot = kinematics_array.bot(self.kinematics[0][3][0])
+        frames_number = len(self.kinematics)
+
+        # assert
+
+        for column, block_size in ((bot.angles, frames_number * 8),
+                                   (bot.positions, frames_number * 16)):
+            low, high = np.byte_bounds(column)
+            self.assertEqual(high - low, block_size)
+        self.assertEqual(read_header(self.filename)["arrays"]["positions"]["shape"],
+                         [65, frames_number, 2])
+
+    def test_polar_columns(self):
+        """
+        Test polar columns are saved
+        """
+
+        # assign
+
+        kinematics_array = as_kinematics_array(self.kinematics)
+        polar_kinematics = kinematics_array.with_polar(kinematics_array.angles / 2,
+                                                       kinematics_array.angles * 2)
+        save_kinematics(self.filename, polar_kinematics)
+        header = read_header(self.filename)
+
+        # assert
+
+        self.assertEqual(header["frames_number"], 200)
+        self.assertEqual(header["bots_number"], 65)
+        self.assertTrue(np.array_equal(load_kinematics(self.filename).distances,
+                                       polar_kinematics.distances))
+
+    def test_corrupted_files(self):
+        """
+        Test truncated and foreign files are rejected
+        """
+
+        # assign
+
+        save_kinematics(self.filename, self.kinematics)
+        with open(self.filename, 'r+b') as file:
+            file.truncate(os.path.getsize(self.filename) - 1)
+        foreign_filename = os.path.join(self.directory.name, "foreign.ampy")
+        with open(foreign_filename, 'wb') as file:
+            file.write(b"not a kinematics file")
+
+        # assert
+
+        with self.assertRaises(ValueError):
+            load_kinematics(self.filename)
+        with self.assertRaises(ValueError):
+            load_kinematics(foreign_filename)
+
+    def test_archive(self):
+        """
+        Test archived kinematics are restored within the quantization steps
+        """
+
+        # assign
+
+        kinematics_array = as_kinematics_array(self.kinematics)
+        polar_kinematics = kinematics_array.with_polar(kinematics_array.angles / 2,
+                                                       kinematics_array.angles * 2)
+        save_archive(self.filename, polar_kinematics, chunk_size=64)
+        archive = ArchiveReader(self.filename)
+        restored = load_archive(self.filename)
+
+        # assert
+
+        self.assertEqual(archive.chunks_number, 4)
+        self.assertEqual(len(archive), 200)
+        self.assertTrue(np.array_equal(restored.ids, kinematics_array.ids))
+        self.assertTrue(np.array_equal(restored.positions, kinematics_array.positions))
+        self.assertLessEqual(np.abs(restored.angles - kinematics_array.angles).max(), 5e-5)
+        self.assertLessEqual(np.abs(restored.distances - polar_kinematics.distances).max(), 5e-4)
+        self.assertTrue(np.array_equal(archive.chunk(2).positions,
+                                       kinematics_array.positions[128:192]))
+        self.assertTrue(np.array_equal(archive.read(60, 70).positions,
+                                       kinematics_array.positions[60:70]))
+        self.assertEqual(archive.read(300).frames_number, 0)
+
+    def test_truncated_archive(self):
+        """
+        Test truncated archives are rejected
+        """
+
+        # assign
+
+        save_archive(self.filename, self.kinematics)
+        with open(self.filename, 'r+b') as file:
+            file.truncate(os.path.getsize(self.filename) - 1)
+
+        # assert
+
+        with self.assertRaises(ValueError):
+            ArchiveReader(self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
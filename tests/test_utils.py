@@ -35,6 +35,22 @@ class TestUtils(unittest.TestCase):
             video_original = get_video(self.filename, 0, 125, 10)
         except:
             self.fail()
+
+    def test_get_video_decode_modes(self):
+        """
+        Test *get_video* method gives the same frames in both decoding modes
+        """
+
+        # assign
+
+        seek_frames = get_video(self.filename, 0, 40, 7, decode_mode="seek")
+        sequential_frames = get_video(self.filename, 0, 40, 7, decode_mode="sequential")
+
+        # assert
+
+        self.assertEqual(len(seek_frames), len(sequential_frames))
+        for seek_frame, sequential_frame in zip(seek_frames, sequential_frames):
+            self.assertTrue(np.array_equal(seek_frame, sequential_frame))
             
     def test_save_video(self):
         """